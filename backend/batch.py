@@ -0,0 +1,269 @@
+"""Offline batch processing of a folder of recordings.
+
+Runs the full denoise + transcription pipeline against a local SQLite/filesystem
+repository instead of Supabase, spreads files across all CPU cores and writes
+the result as an OpenSLR-style dataset (`<name>/wav/*.wav` + `line_index.tsv`).
+Near-duplicates are detected up front, with the same `DUPLICATE_*` settings as
+the server. Like the frontend export, the dataset holds the original audio unless
+`--audio cleaned` asks for the denoised versions.
+
+Usage:
+    python batch.py /path/to/recordings /path/to/output --name my_dataset
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+import soundfile as sf
+from dotenv import load_dotenv
+from repository.local.local_project_repository import LocalProjectRepository
+from repository.project_repository import ProjectStatus, AudioFileStatus
+from service.asr_router_service import AsrRouterService
+from service.fingerprint_service import compute_fingerprint, FingerprintIndex
+from service.ingest_service import SUPPORTED_EXTENSIONS, normalize_audio
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOCAL_USER_ID = "local"
+
+# Per-process state, set up once by _init_worker
+_worker_service = None
+
+
+def _init_worker(data_dir: str) -> None:
+    """Create a repository and service for this worker process"""
+    global _worker_service
+    from service.project_service import ProjectService
+
+    # Each worker already owns a core; keep torch from oversubscribing it
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    _worker_service = ProjectService(LocalProjectRepository(data_dir))
+
+
+def _process_file(file_id: str, file_path: str, asr_model: Optional[str]) -> bool:
+    """Run denoise + transcription for a single file inside a worker"""
+    return asyncio.run(_worker_service._handle_audio_file(file_id, file_path, asr_model=asr_model))
+
+
+def _fingerprint_file(file_path: str) -> Optional[np.ndarray]:
+    """Fingerprint a stored raw file inside a worker, decoding other formats via WAV"""
+    try:
+        try:
+            audio, sample_rate = sf.read(file_path, dtype="float32")
+        except RuntimeError:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                wav_file = Path(temp_dir) / "audio.wav"
+                normalize_audio(Path(file_path), wav_file)
+                audio, sample_rate = sf.read(wav_file, dtype="float32")
+        return compute_fingerprint(audio, sample_rate)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint {file_path}: {str(e)}")
+        return None
+
+
+async def deduplicate(
+    repository: LocalProjectRepository,
+    project_id: str,
+    pending_files: List[Dict[str, Any]],
+    executor: ProcessPoolExecutor
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Fingerprint imported files on the workers and flag or skip near-duplicates.
+
+    Uses the same settings as ProjectService. Returns the files still to
+    process and the number skipped.
+    """
+    action = os.getenv("DUPLICATE_ACTION", "flag")
+    if action == "off":
+        return pending_files, 0
+    scope = project_id if os.getenv("DUPLICATE_SCOPE", "project") == "project" else None
+    threshold = float(os.getenv("DUPLICATE_THRESHOLD", "0.75"))
+
+    index = FingerprintIndex.from_records(await repository.get_audio_file_fingerprints(LOCAL_USER_ID, scope))
+    # Match in import order so the first copy of a recording is the one kept
+    pending_files = sorted(pending_files, key=lambda audio_file: audio_file["created_at"])
+    paths = [str(repository.get_storage_file_path(audio_file["file_path_raw"])) for audio_file in pending_files]
+    futures = [executor.submit(_fingerprint_file, path) for path in paths]
+    remaining = []
+    skipped_count = 0
+    for audio_file, future in zip(pending_files, futures):
+        try:
+            fingerprint = future.result()
+        except Exception as e:
+            # A dead worker leaves the file unfingerprinted rather than aborting the import
+            logger.warning(f"Could not fingerprint file {audio_file['id']}: {str(e) or type(e).__name__}")
+            fingerprint = None
+        if fingerprint is None:
+            remaining.append(audio_file)
+            continue
+
+        match = index.query_or_add(audio_file["id"], project_id, fingerprint, threshold, scope)
+        duplicate_of = match[0] if match else None
+        await repository.update_audio_file_fingerprint(audio_file["id"], fingerprint.astype("<u2").tobytes(), duplicate_of)
+        if duplicate_of and action == "skip":
+            await repository.update_audio_file_status(
+                audio_file["id"], AudioFileStatus.SKIPPED, f"Skipped: near-duplicate of {duplicate_of}"
+            )
+            skipped_count += 1
+        else:
+            remaining.append(audio_file)
+
+    logger.info(f"Fingerprinted {len(pending_files)} files, skipped {skipped_count} near-duplicates")
+    return remaining, skipped_count
+
+
+def _find_audio_files(input_dir: Path) -> List[Path]:
+    audio_files = []
+    for path in sorted(input_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        if path.suffix.lower() in SUPPORTED_EXTENSIONS:
+            audio_files.append(path)
+        else:
+            logger.warning(f"Skipping unsupported file: {path}")
+    return audio_files
+
+
+def _safe_file_name(file_name: str, used_names: set) -> str:
+    """Sanitize a file name and make it unique, matching the frontend export"""
+    safe_name = re.sub(r"\s+", "_", re.sub(r"[^\w\s.-]", "", file_name))
+    stem, _, extension = safe_name.rpartition(".")
+    unique_name = safe_name
+    counter = 1
+    while unique_name.lower() in used_names:
+        unique_name = f"{stem}_{counter}.{extension}"
+        counter += 1
+    used_names.add(unique_name.lower())
+    return unique_name
+
+
+def export_dataset(repository: LocalProjectRepository, project: Dict[str, Any], output_dir: Path, use_cleaned: bool = False) -> Path:
+    """Write completed files as an OpenSLR-style dataset.
+
+    Exports the raw audio, as the frontend does, or the denoised audio with
+    `use_cleaned`. Raw files that are not WAV are converted to canonical WAV.
+    """
+    dataset_name = re.sub(r"\s+", "_", project["name"]).lower()
+    dataset_path = output_dir / dataset_name
+    wav_path = dataset_path / "wav"
+    wav_path.mkdir(parents=True, exist_ok=True)
+
+    used_names = set()
+    lines = ["filename\ttranscription\n"]
+    for audio_file in repository.get_completed_audio_files(project["id"]):
+        file_path = audio_file["file_path_cleaned"] if use_cleaned and audio_file["file_path_cleaned"] else audio_file["file_path_raw"]
+        source = repository.get_storage_file_path(file_path)
+        file_name = _safe_file_name(f"{Path(audio_file['file_name']).stem}.wav", used_names)
+        if source.suffix.lower() == ".wav":
+            shutil.copyfile(source, wav_path / file_name)
+        else:
+            normalize_audio(source, wav_path / file_name)
+        if audio_file["transcription_content"]:
+            lines.append(f"{file_name}\t{audio_file['transcription_content'].strip()}\n")
+
+    (dataset_path / "line_index.tsv").write_text("".join(lines), encoding="utf-8")
+    logger.info(f"Exported {len(lines) - 1} transcribed files to {dataset_path}")
+    return dataset_path
+
+
+async def run_batch(
+    input_dir: Path,
+    output_dir: Path,
+    name: str,
+    workers: int,
+    data_dir: str,
+    asr_model: Optional[str] = None,
+    use_cleaned: bool = False
+) -> Dict[str, Any]:
+    """Import, process and export a folder of recordings"""
+    # Fail before importing anything if the model has no ASR endpoint
+    AsrRouterService.from_env().check_model(asr_model)
+    repository = LocalProjectRepository(data_dir)
+    project_id = repository.create_project(name, f"Batch import of {input_dir}", LOCAL_USER_ID, asr_model)
+
+    source_files = _find_audio_files(input_dir)
+    repository.import_audio_files(project_id, LOCAL_USER_ID, source_files)
+    await repository.update_project_status(project_id, LOCAL_USER_ID, ProjectStatus.IN_PROGRESS)
+
+    pending_files = await repository.get_pending_audio_files(project_id)
+    total_files = len(pending_files)
+    logger.info(f"Processing {total_files} files with {workers} workers")
+
+    processed_count = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(repository.root_path),)) as executor:
+            # Skipped duplicates count as processed, like in the server pipeline
+            pending_files, processed_count = await deduplicate(repository, project_id, pending_files, executor)
+            futures = {
+                executor.submit(_process_file, audio_file["id"], audio_file["file_path_raw"], asr_model): audio_file["id"]
+                for audio_file in pending_files
+            }
+            for done_count, future in enumerate(as_completed(futures), start=processed_count + 1):
+                try:
+                    processed = future.result()
+                except Exception as e:
+                    # e.g. BrokenProcessPool after a worker was OOM-killed; one bad
+                    # file must not lose the rest of the import
+                    file_id = futures[future]
+                    logger.error(f"Worker failed on file {file_id}: {str(e)}")
+                    await repository.update_audio_file_status(file_id, AudioFileStatus.FAILED, str(e) or type(e).__name__)
+                    processed = False
+                if processed:
+                    processed_count += 1
+                if done_count % 50 == 0 or done_count == total_files:
+                    await repository.update_project_progress(project_id, int(done_count / total_files * 100))
+    finally:
+        # Always record the outcome and export whatever was transcribed
+        final_status = ProjectStatus.COMPLETED if processed_count == total_files else ProjectStatus.ARCHIVED
+        await repository.update_project_status(project_id, LOCAL_USER_ID, final_status)
+
+        project = await repository.get_project_by_id(project_id, LOCAL_USER_ID)
+        dataset_path = export_dataset(repository, project, output_dir, use_cleaned)
+
+    return {
+        "project_id": project_id,
+        "total_files": total_files,
+        "processed_files": processed_count,
+        "status": final_status,
+        "dataset_path": str(dataset_path)
+    }
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Process a folder of recordings offline into an OpenSLR dataset")
+    parser.add_argument("input_dir", type=Path, help="Folder containing the recordings")
+    parser.add_argument("output_dir", type=Path, help="Folder to write the dataset to")
+    parser.add_argument("--name", help="Dataset name (defaults to the input folder name)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument("--data-dir", default=os.getenv("LOCAL_DATA_DIR"), help="Local repository directory")
+    parser.add_argument("--asr-model", help="ASR model to transcribe with (defaults to ASR_DEFAULT_MODEL)")
+    parser.add_argument(
+        "--audio",
+        choices=["raw", "cleaned"],
+        default="raw",
+        help="Export the original audio (like the frontend) or the denoised audio"
+    )
+    args = parser.parse_args()
+
+    result = asyncio.run(run_batch(
+        args.input_dir,
+        args.output_dir,
+        args.name or args.input_dir.resolve().name,
+        max(1, args.workers),
+        args.data_dir,
+        args.asr_model,
+        args.audio == "cleaned"
+    ))
+    logger.info(f"Batch completed: {result}")
+
+
+if __name__ == "__main__":
+    main()
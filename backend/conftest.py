@@ -0,0 +1 @@
+# Lets tests import the backend packages (service, repository, models) directly
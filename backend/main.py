@@ -1,12 +1,18 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import logging
 import os
 from dotenv import load_dotenv
 from repository.supabase.supabase_project_repository import SupabaseProjectRepository
 from service.project_service import ProjectService
+from service.progress_service import ProgressService
+from service.scheduler_service import SchedulerService
+from service.asr_router_service import AsrRouterService
+from service.ingest_service import IngestService, UnsupportedAudioError, UploadNotFoundError, UploadOffsetError, UploadSizeError
 from service.test_service import TestService
 from service.auth_service import AuthService
+from models.project import UploadCreate
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -30,10 +36,22 @@ app.add_middleware(
 
 # Initialize repository and services
 repository = SupabaseProjectRepository()
-project_service = ProjectService(repository)
+progress_service = ProgressService()
+scheduler = SchedulerService.from_env()
+asr_router = AsrRouterService.from_env()
+project_service = ProjectService(repository, progress_service, scheduler, asr_router)
+ingest_service = IngestService(repository)
 test_service = TestService(repository)
 auth_service = AuthService(repository)
 
+@app.on_event("startup")
+async def start_asr_health_checks():
+    asr_router.start_health_checks()
+
+@app.on_event("shutdown")
+async def stop_asr_health_checks():
+    await asr_router.stop_health_checks()
+
 @app.post("/project/process/{projectid}")
 async def process_project(projectid: str, user_id: str = Depends(auth_service.get_current_user)):
     """Process a project's audio files"""
@@ -44,6 +62,80 @@ async def process_project(projectid: str, user_id: str = Depends(auth_service.ge
         logger.error(f"Error processing project: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/project/progress/{projectid}")
+async def stream_project_progress(projectid: str, user_id: str = Depends(auth_service.get_current_user)):
+    """Stream file stage transitions and project progress as server-sent events"""
+    try:
+        await repository.get_project_by_id(projectid, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return StreamingResponse(
+        progress_service.stream_events(projectid, lambda: repository.get_project_by_id(projectid, user_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/project/{projectid}/uploads")
+async def create_upload(projectid: str, upload: UploadCreate, user_id: str = Depends(auth_service.get_current_user)):
+    """Open a chunked upload for an audio file"""
+    try:
+        return await ingest_service.create_upload(projectid, user_id, upload.file_name, upload.file_size)
+    except UnsupportedAudioError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except UploadSizeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/project/uploads/{upload_id}")
+async def get_upload(upload_id: str, user_id: str = Depends(auth_service.get_current_user)):
+    """Get the current offset of an upload, to resume it"""
+    try:
+        return await ingest_service.get_upload(upload_id, user_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.put("/project/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    user_id: str = Depends(auth_service.get_current_user)
+):
+    """Append a chunk starting at the `Upload-Offset` header"""
+    try:
+        return await ingest_service.append_chunk(upload_id, user_id, upload_offset, request.stream())
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset})
+    except UploadSizeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+@app.post("/project/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, user_id: str = Depends(auth_service.get_current_user)):
+    """Normalize a fully received upload to WAV and register it as an audio file"""
+    try:
+        return await ingest_service.complete_upload(upload_id, user_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadOffsetError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "offset": e.offset})
+    except UnsupportedAudioError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error completing upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/project/uploads/{upload_id}")
+async def cancel_upload(upload_id: str, user_id: str = Depends(auth_service.get_current_user)):
+    """Discard an unfinished upload"""
+    try:
+        await ingest_service.cancel_upload(upload_id, user_id)
+    except UploadNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 # @app.post("/test/denoise")
 # async def test_denoise(file_id: str = None):
 #     """Test endpoint for noise reduction"""
@@ -13,6 +13,7 @@ class AudioFileStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    SKIPPED = "skipped"
 
 class ProjectCreate(BaseModel):
     name: str
@@ -23,6 +24,7 @@ class ProjectCreate(BaseModel):
     total_size: Optional[int] = 0
     total_duration: Optional[int] = 0
     dataset_path: Optional[str] = None
+    asr_model: Optional[str] = None
 
 class Project(BaseModel):
     id: str
@@ -34,6 +36,11 @@ class Project(BaseModel):
     total_size: Optional[int]
     total_duration: Optional[int]
     dataset_path: Optional[str]
+    asr_model: Optional[str] = None
     created_at: str
     updated_at: str
-    created_by: Optional[str]
\ No newline at end of file
+    created_by: Optional[str]
+
+class UploadCreate(BaseModel):
+    file_name: str
+    file_size: int
\ No newline at end of file
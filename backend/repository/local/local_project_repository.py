@@ -0,0 +1,310 @@
+from typing import List, Optional, Dict, Any
+from pathlib import Path
+from datetime import datetime, timezone
+import os
+import shutil
+import sqlite3
+import uuid
+from ..project_repository import IProjectRepository, ProjectStatus, AudioFileStatus
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+create table if not exists projects (
+    id text primary key,
+    name text not null,
+    description text,
+    status text default 'draft',
+    progress integer default 0,
+    total_files integer default 0,
+    total_size integer default 0,
+    total_duration integer default 0,
+    dataset_path text,
+    asr_model text,
+    created_at text not null,
+    updated_at text not null,
+    created_by text not null
+);
+
+create table if not exists audio_files (
+    id text primary key,
+    project_id text not null references projects(id) on delete cascade,
+    file_name text not null,
+    file_path_raw text not null,
+    file_path_cleaned text,
+    file_size integer not null,
+    duration integer,
+    sample_rate integer,
+    channels integer,
+    bit_depth integer,
+    format text,
+    source_format text,
+    source_sample_rate integer,
+    source_channels integer,
+    source_bit_depth integer,
+    transcription_status text default 'pending',
+    transcription_content text,
+    confidence real,
+    error_message text,
+    fingerprint blob,
+    duplicate_of text,
+    parent_id text references audio_files(id) on delete cascade,
+    segment_start real,
+    segment_end real,
+    created_at text not null,
+    updated_at text not null,
+    created_by text not null
+);
+
+create index if not exists audio_files_project_status
+    on audio_files (project_id, transcription_status);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class LocalProjectRepository(IProjectRepository):
+    """Offline repository backed by a SQLite database and a local storage directory.
+
+    Mirrors the Supabase `projects`/`audio_files` tables and the `audio-files`
+    bucket so that `ProjectService` can run without any network round-trips.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None):
+        default_root = Path(__file__).parent.parent.parent / "local-data"
+        self.root_path = Path(root_dir or os.getenv("LOCAL_DATA_DIR", default_root))
+        self.storage_path = self.root_path / "storage"
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+
+        self.db_path = self.root_path / "speechdata.db"
+        # Several batch workers share the database, so wait on locks instead of failing
+        self.connection = sqlite3.connect(self.db_path, timeout=60, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.execute("pragma synchronous=normal")
+        self.connection.executescript(SCHEMA)
+        logger.info(f"Using local repository at: {self.root_path}")
+
+    def _update(self, table: str, row_id: str, values: Dict[str, Any]) -> None:
+        values = {**values, "updated_at": _now()}
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        with self.connection:
+            self.connection.execute(
+                f"update {table} set {assignments} where id = ?",
+                [*values.values(), row_id]
+            )
+
+    def _storage_file(self, file_path: str) -> Path:
+        """Resolve a storage path, refusing anything outside the storage directory"""
+        resolved = (self.storage_path / file_path).resolve()
+        if self.storage_path.resolve() not in resolved.parents:
+            raise ValueError(f"Invalid storage path: {file_path}")
+        return resolved
+
+    async def get_project_by_id(self, project_id: str, user_id: str) -> Dict[str, Any]:
+        """Get project details by ID"""
+        row = self.connection.execute(
+            "select * from projects where id = ? and created_by = ?", (project_id, user_id)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Project not found with ID: {project_id}")
+        return dict(row)
+
+    async def update_project_status(self, project_id: str, user_id: str, status: ProjectStatus) -> None:
+        """Update project status"""
+        status_value = status.value if hasattr(status, 'value') else status
+        logger.info(f"Updating project {project_id} status to {status_value}")
+        self._update("projects", project_id, {"status": status_value})
+
+    async def update_project_progress(self, project_id: str, progress: int) -> None:
+        """Update project progress"""
+        logger.info(f"Updating project {project_id} progress to {progress}")
+        self._update("projects", project_id, {"progress": progress})
+
+    async def get_pending_audio_files(self, project_id: str) -> List[Dict[str, Any]]:
+        """Get all audio files with pending transcription status"""
+        rows = self.connection.execute(
+            "select * from audio_files where project_id = ? and transcription_status = ? order by created_at desc",
+            (project_id, AudioFileStatus.PENDING.value)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    async def update_audio_file_status(self, file_id: str, status: AudioFileStatus, error_message: Optional[str] = None) -> None:
+        """Update audio file transcription status"""
+        status_value = status.value if hasattr(status, 'value') else status
+
+        update_data = {"transcription_status": status_value}
+        if error_message:
+            update_data["error_message"] = error_message
+
+        self._update("audio_files", file_id, update_data)
+
+    async def update_audio_file_transcription(self, file_id: str, transcription: str, status: AudioFileStatus, confidence: Optional[float] = None) -> None:
+        """Update audio file transcription content and status"""
+        status_value = status.value if hasattr(status, 'value') else status
+
+        update_data = {
+            "transcription_content": transcription,
+            "transcription_status": status_value
+        }
+        if confidence is not None:
+            update_data["confidence"] = confidence
+
+        self._update("audio_files", file_id, update_data)
+
+    async def get_audio_file_content(self, file_path: str) -> bytes:
+        """Get audio file content from storage"""
+        return self._storage_file(file_path).read_bytes()
+
+    async def upload_audio_file(self, file_path: str, file_content: bytes, content_type: str) -> None:
+        """Upload audio file to storage"""
+        target = self._storage_file(file_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(file_content)
+
+    async def upload_audio_file_from_path(self, file_path: str, local_path: Path, content_type: str) -> None:
+        """Upload a local file to storage without reading it into memory"""
+        target = self._storage_file(file_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(local_path, target)
+
+    async def delete_audio_files(self, file_paths: List[str]) -> None:
+        """Delete audio files from storage"""
+        for file_path in file_paths:
+            target = self._storage_file(file_path)
+            if target.exists():
+                target.unlink()
+
+    async def update_audio_file_cleaned_path(self, file_id: str, cleaned_path: str) -> None:
+        """Update the cleaned file path for an audio file"""
+        logger.info(f"Updating audio file {file_id} with cleaned path: {cleaned_path}")
+        self._update("audio_files", file_id, {"file_path_cleaned": cleaned_path})
+
+    async def create_audio_file(self, project_id: str, user_id: str, audio_file: Dict[str, Any]) -> Dict[str, Any]:
+        """Create an audio file entry for an uploaded file and return it"""
+        timestamp = _now()
+        row = {
+            **audio_file,
+            "id": str(uuid.uuid4()),
+            "project_id": project_id,
+            "created_by": user_id,
+            "created_at": timestamp,
+            "updated_at": timestamp
+        }
+        with self.connection:
+            self.connection.execute(
+                f"insert into audio_files ({', '.join(row)}) values ({', '.join('?' for _ in row)})",
+                list(row.values())
+            )
+            self.connection.execute(
+                "update projects set total_files = total_files + 1, total_size = total_size + ?, updated_at = ? where id = ?",
+                (row["file_size"], timestamp, project_id)
+            )
+        return dict(self.connection.execute("select * from audio_files where id = ?", (row["id"],)).fetchone())
+
+    async def create_child_audio_files(self, parent_file_id: str, children: List[Dict[str, Any]]) -> None:
+        """Create audio file entries for segments cut from a parent file"""
+        parent = self.connection.execute(
+            "select project_id, created_by from audio_files where id = ?", (parent_file_id,)
+        ).fetchone()
+        if parent is None:
+            raise ValueError(f"Audio file not found with ID: {parent_file_id}")
+
+        timestamp = _now()
+        with self.connection:
+            for child in children:
+                row = {
+                    **child,
+                    "id": str(uuid.uuid4()),
+                    "parent_id": parent_file_id,
+                    "project_id": parent["project_id"],
+                    "created_by": parent["created_by"],
+                    "created_at": timestamp,
+                    "updated_at": timestamp
+                }
+                self.connection.execute(
+                    f"insert into audio_files ({', '.join(row)}) values ({', '.join('?' for _ in row)})",
+                    list(row.values())
+                )
+
+    async def get_audio_file_fingerprints(self, user_id: str, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get id, project_id and fingerprint bytes of a user's already-processed audio files, optionally in one project"""
+        query = (
+            "select id, project_id, fingerprint from audio_files "
+            "where created_by = ? and transcription_status != ? and fingerprint is not null"
+        )
+        params = [user_id, AudioFileStatus.PENDING.value]
+        if project_id:
+            query += " and project_id = ?"
+            params.append(project_id)
+        rows = self.connection.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    async def update_audio_file_fingerprint(self, file_id: str, fingerprint: bytes, duplicate_of: Optional[str] = None) -> None:
+        """Store an audio file's fingerprint and the file it duplicates, if any"""
+        self._update("audio_files", file_id, {"fingerprint": fingerprint, "duplicate_of": duplicate_of})
+
+    # Local-only helpers used by the batch CLI; the Supabase flow handles these in the frontend
+
+    def create_project(self, name: str, description: str, user_id: str, asr_model: Optional[str] = None) -> str:
+        """Create a project and return its ID"""
+        project_id = str(uuid.uuid4())
+        timestamp = _now()
+        with self.connection:
+            self.connection.execute(
+                "insert into projects (id, name, description, status, asr_model, created_at, updated_at, created_by) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?)",
+                (project_id, name, description, ProjectStatus.DRAFT.value, asr_model, timestamp, timestamp, user_id)
+            )
+        logger.info(f"Created local project {project_id}: {name}")
+        return project_id
+
+    def import_audio_files(self, project_id: str, user_id: str, source_files: List[Path]) -> int:
+        """Copy source files into storage and register them as pending audio files"""
+        rows = []
+        total_size = 0
+        for source_file in source_files:
+            file_id = str(uuid.uuid4())
+            # Keep the frontend's `project_id/<folder>/<name>` layout so cleaned paths line up
+            storage_path = f"{project_id}/{file_id}/{source_file.name}"
+            target = self._storage_file(storage_path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(source_file, target)
+
+            file_size = target.stat().st_size
+            total_size += file_size
+            timestamp = _now()
+            rows.append((
+                file_id, project_id, source_file.name, storage_path, file_size,
+                source_file.suffix.lstrip('.').lower(), AudioFileStatus.PENDING.value,
+                timestamp, timestamp, user_id
+            ))
+
+        with self.connection:
+            self.connection.executemany(
+                "insert into audio_files (id, project_id, file_name, file_path_raw, file_size, format, "
+                "transcription_status, created_at, updated_at, created_by) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.connection.execute(
+                "update projects set total_files = total_files + ?, total_size = total_size + ?, updated_at = ? where id = ?",
+                (len(rows), total_size, _now(), project_id)
+            )
+        logger.info(f"Imported {len(rows)} files into project {project_id}")
+        return len(rows)
+
+    def get_completed_audio_files(self, project_id: str) -> List[Dict[str, Any]]:
+        """Get all audio files with a completed transcription, using segments in place of split parents"""
+        rows = self.connection.execute(
+            "select * from audio_files where project_id = ? and transcription_status = ? "
+            "and id not in (select parent_id from audio_files where parent_id is not null) order by file_name",
+            (project_id, AudioFileStatus.COMPLETED.value)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_storage_file_path(self, file_path: str) -> Path:
+        """Get the on-disk location of a storage path"""
+        return self._storage_file(file_path)
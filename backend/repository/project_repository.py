@@ -1,4 +1,5 @@
 from typing import Optional, List, Dict, Any
+from pathlib import Path
 from abc import ABC, abstractmethod
 from models.project import ProjectStatus, AudioFileStatus
 
@@ -31,7 +32,7 @@ class IProjectRepository(ABC):
         pass
 
     @abstractmethod
-    async def update_audio_file_transcription(self, file_id: str, transcription: str, status: AudioFileStatus) -> None:
+    async def update_audio_file_transcription(self, file_id: str, transcription: str, status: AudioFileStatus, confidence: Optional[float] = None) -> None:
         """Update audio file transcription content and status"""
         pass
 
@@ -45,7 +46,37 @@ class IProjectRepository(ABC):
         """Upload audio file to storage"""
         pass
 
+    @abstractmethod
+    async def upload_audio_file_from_path(self, file_path: str, local_path: Path, content_type: str) -> None:
+        """Upload a local file to storage without reading it into memory"""
+        pass
+
+    @abstractmethod
+    async def delete_audio_files(self, file_paths: List[str]) -> None:
+        """Delete audio files from storage"""
+        pass
+
     @abstractmethod
     async def update_audio_file_cleaned_path(self, file_id: str, cleaned_path: str) -> None:
         """Update the cleaned file path for an audio file"""
+        pass
+
+    @abstractmethod
+    async def create_audio_file(self, project_id: str, user_id: str, audio_file: Dict[str, Any]) -> Dict[str, Any]:
+        """Create an audio file entry for an uploaded file and return it"""
+        pass
+
+    @abstractmethod
+    async def create_child_audio_files(self, parent_file_id: str, children: List[Dict[str, Any]]) -> None:
+        """Create audio file entries for segments cut from a parent file"""
+        pass
+
+    @abstractmethod
+    async def get_audio_file_fingerprints(self, user_id: str, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get id, project_id and fingerprint bytes of a user's already-processed audio files, optionally in one project"""
+        pass
+
+    @abstractmethod
+    async def update_audio_file_fingerprint(self, file_id: str, fingerprint: bytes, duplicate_of: Optional[str] = None) -> None:
+        """Store an audio file's fingerprint and the file it duplicates, if any"""
         pass 
\ No newline at end of file
@@ -1,6 +1,8 @@
 from typing import List, Optional, Dict, Any
 from supabase import create_client, Client
 import os
+import base64
+from pathlib import Path
 from ..project_repository import IProjectRepository, ProjectStatus, AudioFileStatus
 import logging
 
@@ -55,15 +57,19 @@ class SupabaseProjectRepository(IProjectRepository):
             
         self.supabase.table("audio_files").update(update_data).eq("id", file_id).execute()
 
-    async def update_audio_file_transcription(self, file_id: str, transcription: str, status: AudioFileStatus) -> None:
+    async def update_audio_file_transcription(self, file_id: str, transcription: str, status: AudioFileStatus, confidence: Optional[float] = None) -> None:
         """Update audio file transcription content and status"""
         # Convert status enum to string if needed
         status_value = status.value if hasattr(status, 'value') else status
         
-        self.supabase.table("audio_files").update({
+        update_data = {
             "transcription_content": transcription,
             "transcription_status": status_value
-        }).eq("id", file_id).execute()
+        }
+        if confidence is not None:
+            update_data["confidence"] = confidence
+
+        self.supabase.table("audio_files").update(update_data).eq("id", file_id).execute()
 
     async def get_audio_file_content(self, file_path: str) -> bytes:
         """Get audio file content from storage"""
@@ -77,6 +83,20 @@ class SupabaseProjectRepository(IProjectRepository):
             {"content-type": content_type}
         )
 
+    async def upload_audio_file_from_path(self, file_path: str, local_path: Path, content_type: str) -> None:
+        """Upload a local file to storage without reading it into memory"""
+        # Given a path, the storage client streams the file as the request body
+        self.supabase.storage.from_("audio-files").upload(
+            file_path,
+            str(local_path),
+            {"content-type": content_type}
+        )
+
+    async def delete_audio_files(self, file_paths: List[str]) -> None:
+        """Delete audio files from storage"""
+        if file_paths:
+            self.supabase.storage.from_("audio-files").remove(file_paths)
+
     async def update_audio_file_cleaned_path(self, file_id: str, cleaned_path: str) -> None:
         """Update the cleaned file path for an audio file"""
         try:
@@ -88,3 +108,52 @@ class SupabaseProjectRepository(IProjectRepository):
         except Exception as e:
             logger.error(f"Failed to update audio file cleaned path: {str(e)}")
             raise
+
+    async def create_audio_file(self, project_id: str, user_id: str, audio_file: Dict[str, Any]) -> Dict[str, Any]:
+        """Create an audio file entry for an uploaded file and return it"""
+        response = self.supabase.table("audio_files").insert({
+            **audio_file,
+            "project_id": project_id,
+            "created_by": user_id
+        }).execute()
+        return response.data[0]
+
+    async def create_child_audio_files(self, parent_file_id: str, children: List[Dict[str, Any]]) -> None:
+        """Create audio file entries for segments cut from a parent file"""
+        response = self.supabase.table("audio_files").select("project_id, created_by").eq("id", parent_file_id).execute()
+        if not response.data:
+            raise ValueError(f"Audio file not found with ID: {parent_file_id}")
+        parent = response.data[0]
+
+        self.supabase.table("audio_files").insert([
+            {**child, "parent_id": parent_file_id, "project_id": parent["project_id"], "created_by": parent["created_by"]}
+            for child in children
+        ]).execute()
+
+    async def get_audio_file_fingerprints(self, user_id: str, project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get id, project_id and fingerprint bytes of a user's already-processed audio files, optionally in one project"""
+        records = []
+        page_size = 1000
+        offset = 0
+        while True:
+            query = self.supabase.table("audio_files").select("id, project_id, fingerprint") \
+                .eq("created_by", user_id) \
+                .neq("transcription_status", "pending") \
+                .not_.is_("fingerprint", "null")
+            if project_id:
+                query = query.eq("project_id", project_id)
+            response = query.order("id").range(offset, offset + page_size - 1).execute()
+            records.extend(
+                {**row, "fingerprint": base64.b64decode(row["fingerprint"])}
+                for row in response.data
+            )
+            if len(response.data) < page_size:
+                return records
+            offset += page_size
+
+    async def update_audio_file_fingerprint(self, file_id: str, fingerprint: bytes, duplicate_of: Optional[str] = None) -> None:
+        """Store an audio file's fingerprint and the file it duplicates, if any"""
+        self.supabase.table("audio_files").update({
+            "fingerprint": base64.b64encode(fingerprint).decode('utf-8'),
+            "duplicate_of": duplicate_of
+        }).eq("id", file_id).execute()
@@ -0,0 +1,177 @@
+from typing import Dict, Any, List, Optional
+import asyncio
+import logging
+import os
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class AsrEndpoint:
+    """One ASR service replica"""
+
+    def __init__(self, model: str, url: str):
+        self.model = model
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+
+
+class AsrRouterService:
+    """Routes ASR requests across replicas of each model.
+
+    Each request goes to the healthy endpoint of the requested model with the
+    fewest outstanding requests. Endpoints are ejected after repeated request
+    failures or a failed `/health` check, and re-admitted once `/health`
+    succeeds again. If every endpoint of a model is ejected, the router still
+    tries the least-loaded one rather than failing outright.
+    """
+
+    def __init__(self, endpoints: List[AsrEndpoint], default_model: str, health_interval: float = 10.0, max_failures: int = 3):
+        if not endpoints:
+            raise ValueError("At least one ASR endpoint is required")
+        self.endpoints = endpoints
+        self.default_model = default_model
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self._health_task: Optional[asyncio.Task] = None
+        for endpoint in endpoints:
+            logger.info(f"Registered ASR endpoint {endpoint.url} for model {endpoint.model}")
+        self.check_model(default_model)
+
+    @classmethod
+    def from_env(cls) -> "AsrRouterService":
+        """Build the registry from ASR_ENDPOINTS, falling back to ASR_SERVICE_URL.
+
+        ASR_ENDPOINTS is a comma-separated list of `model=url` entries, e.g.
+        `wav2vec2-vitouphy=http://asr-1:8000,whisper-kaksoky=http://asr-2:8001`.
+        """
+        default_model = os.getenv("ASR_DEFAULT_MODEL", "wav2vec2-vitouphy")
+        endpoints = []
+        for entry in os.getenv("ASR_ENDPOINTS", "").split(","):
+            if not entry.strip():
+                continue
+            model, _, url = entry.strip().partition("=")
+            if not url:
+                raise ValueError(f"Invalid ASR_ENDPOINTS entry: {entry}")
+            endpoints.append(AsrEndpoint(model.strip(), url.strip()))
+
+        if not endpoints:
+            endpoints.append(AsrEndpoint(default_model, os.getenv("ASR_SERVICE_URL", "http://localhost:8000")))
+
+        return cls(
+            endpoints,
+            default_model,
+            health_interval=float(os.getenv("ASR_HEALTH_INTERVAL", "10"))
+        )
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        """Current state of every registered endpoint"""
+        return [
+            {
+                "model": endpoint.model,
+                "url": endpoint.url,
+                "healthy": endpoint.healthy,
+                "outstanding": endpoint.outstanding
+            }
+            for endpoint in self.endpoints
+        ]
+
+    def check_model(self, model: Optional[str] = None) -> str:
+        """Resolve `model` (or the default) and make sure an endpoint serves it"""
+        model = model or self.default_model
+        if not any(endpoint.model == model for endpoint in self.endpoints):
+            raise ValueError(f"No ASR endpoint registered for model: {model}")
+        return model
+
+    def _select(self, model: str, exclude: List[AsrEndpoint]) -> Optional[AsrEndpoint]:
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.model == model and endpoint not in exclude]
+        if not candidates and not exclude:
+            raise ValueError(f"No ASR endpoint registered for model: {model}")
+        healthy = [endpoint for endpoint in candidates if endpoint.healthy]
+        pool = healthy or candidates
+        if not pool:
+            return None
+        return min(pool, key=lambda endpoint: endpoint.outstanding)
+
+    async def post(self, path: str, json: Dict[str, Any], model: Optional[str] = None, timeout: float = 60) -> requests.Response:
+        """POST to the least-loaded endpoint of `model`, retrying once elsewhere if it can't be reached.
+
+        Connection errors and connect timeouts are retried on another replica.
+        A read timeout is not: the replica may still be transcribing, so
+        resubmitting would double the work and mark a busy replica as failing.
+        """
+        model = model or self.default_model
+        tried: List[AsrEndpoint] = []
+        while True:
+            endpoint = self._select(model, tried)
+            if endpoint is None:
+                raise Exception(f"All ASR endpoints for model {model} are unavailable")
+            tried.append(endpoint)
+
+            endpoint.outstanding += 1
+            try:
+                response = await asyncio.to_thread(requests.post, f"{endpoint.url}{path}", json=json, timeout=timeout)
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout; ReadTimeout propagates without a retry
+                self._record_failure(endpoint, str(e))
+                if len(tried) >= 2:
+                    raise
+                continue
+            finally:
+                endpoint.outstanding -= 1
+
+            if response.status_code >= 500:
+                self._record_failure(endpoint, f"HTTP {response.status_code}")
+            else:
+                endpoint.failures = 0
+            return response
+
+    def _record_failure(self, endpoint: AsrEndpoint, reason: str) -> None:
+        endpoint.failures += 1
+        logger.warning(f"ASR endpoint {endpoint.url} failed ({endpoint.failures}): {reason}")
+        if endpoint.healthy and endpoint.failures >= self.max_failures:
+            endpoint.healthy = False
+            logger.error(f"Ejected ASR endpoint {endpoint.url}")
+
+    async def check_health(self) -> None:
+        """Probe `/health` on every endpoint and update its state"""
+        async def probe(endpoint: AsrEndpoint) -> None:
+            try:
+                response = await asyncio.to_thread(requests.get, f"{endpoint.url}/health", timeout=5)
+                healthy = response.status_code == 200
+            except requests.RequestException:
+                healthy = False
+
+            if healthy and not endpoint.healthy:
+                logger.info(f"Re-admitted ASR endpoint {endpoint.url}")
+            elif not healthy and endpoint.healthy:
+                logger.error(f"Ejected ASR endpoint {endpoint.url}: health check failed")
+            endpoint.healthy = healthy
+            if healthy:
+                endpoint.failures = 0
+
+        await asyncio.gather(*(probe(endpoint) for endpoint in self.endpoints))
+
+    def start_health_checks(self) -> None:
+        """Start polling `/health` in the background"""
+        async def loop() -> None:
+            while True:
+                try:
+                    await self.check_health()
+                except Exception as e:
+                    logger.error(f"ASR health check failed: {str(e)}")
+                await asyncio.sleep(self.health_interval)
+
+        if self._health_task is None:
+            self._health_task = asyncio.create_task(loop())
+
+    async def stop_health_checks(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
@@ -0,0 +1,257 @@
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NUM_BANDS = 17  # 16 bits per frame
+FRAME_SECONDS = 0.128
+HOP_SECONDS = 0.010
+BLOCK_FRAMES = 4096
+
+# Matching
+INDEX_STRIDE = 4  # index every 4th frame; queries look up every frame
+MIN_OVERLAP = 0.8  # aligned frames needed, as a fraction of the shorter file
+MIN_HITS = 3  # lookup hits at one offset before a candidate is verified
+MAX_CANDIDATES = 10
+MAX_BUCKET_SIZE = 5000  # codes this common carry too little information to look up
+MERGE_SIZE = 8192  # pending index entries merged into the sorted index at once
+IGNORED_CODES = np.array([0x0000, 0xFFFF], dtype=np.uint16)  # digital silence / clipping
+BIT_FLIPS = np.array([0] + [1 << bit for bit in range(16)], dtype=np.uint16)
+
+BIT_COUNTS = np.unpackbits(np.arange(1 << 16, dtype="<u2").view(np.uint8)).reshape(-1, 16).sum(axis=1)
+
+
+def compute_fingerprint(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Per-frame binary sub-fingerprints of an utterance.
+
+    Energies in 17 log-spaced bands (300 Hz - 3 kHz) are computed for 128 ms
+    frames every 10 ms, after trimming leading/trailing silence. Each frame
+    gets 16 bits: whether the energy difference between adjacent bands rose
+    or fell since the previous frame. The bits only depend on the sign of
+    local energy changes, so re-encoded, re-levelled or noisier copies keep
+    most of them, and since every frame is fingerprinted separately a
+    trimmed copy still lines up with the original at some frame offset.
+    """
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+    audio = audio.astype(np.float32)
+
+    frame_length = int(round(FRAME_SECONDS * sample_rate))
+    hop_length = max(1, int(round(HOP_SECONDS * sample_rate)))
+    if len(audio) < frame_length:
+        audio = np.pad(audio, (0, frame_length - len(audio)))
+
+    # Sum FFT bins into bands with a (bins x bands) indicator matrix
+    frequencies = np.fft.rfftfreq(frame_length, 1 / sample_rate)
+    edges = np.geomspace(300, min(3000, sample_rate / 2), NUM_BANDS + 1)
+    band_index = np.digitize(frequencies, edges) - 1
+    band_matrix = (band_index[:, None] == np.arange(NUM_BANDS)[None, :]).astype(np.float32)
+    window = np.hanning(frame_length).astype(np.float32)
+
+    # Frame in blocks so long recordings don't materialize every frame at once
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_length)[::hop_length]
+    band_energies = []
+    frame_energies = []
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        spectrum = np.abs(np.fft.rfft(frames[start:start + BLOCK_FRAMES] * window, axis=1)) ** 2
+        band_energies.append(spectrum @ band_matrix)
+        frame_energies.append(np.log(spectrum.sum(axis=1) + 1e-10))
+    band_energies = np.concatenate(band_energies)
+    frame_energy = np.concatenate(frame_energies)
+
+    # Trim leading/trailing frames near the noise floor (or 40 dB below the peak)
+    threshold = max(frame_energy.max() - np.log(1e4), np.percentile(frame_energy, 10) + np.log(10))
+    active = np.flatnonzero(frame_energy > min(threshold, frame_energy.max() - 1e-6))
+    band_energies = band_energies[max(active[0] - 1, 0):active[-1] + 1]
+    if len(band_energies) < 2:
+        band_energies = np.pad(band_energies, ((0, 2 - len(band_energies)), (0, 0)))
+
+    band_differences = band_energies[:, :-1] - band_energies[:, 1:]
+    bits = (band_differences[1:] - band_differences[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view("<u2")[:, 0].copy()
+
+
+def fingerprint_similarity(query: np.ndarray, candidate: np.ndarray, offset: int) -> Optional[float]:
+    """Fraction of matching bits with `query` frame 0 aligned to `candidate` frame `offset`.
+
+    Returns None when fewer than MIN_OVERLAP of the shorter fingerprint's
+    frames overlap at that offset.
+    """
+    query_start = max(0, -offset)
+    candidate_start = max(0, offset)
+    length = min(len(query) - query_start, len(candidate) - candidate_start)
+    if length <= 0 or length < MIN_OVERLAP * min(len(query), len(candidate)):
+        return None
+    differing = BIT_COUNTS[query[query_start:query_start + length] ^ candidate[candidate_start:candidate_start + length]]
+    return 1.0 - float(differing.mean()) / 16
+
+
+class FingerprintIndex:
+    """In-memory fingerprint index for one tenant or project.
+
+    All sub-fingerprints live in one growable buffer. Every INDEX_STRIDE-th
+    frame's code is also kept in an inverted index (sorted code/position
+    arrays, plus a small unsorted batch of recent additions). A query looks
+    up each of its frames and every code one bit away, votes for
+    (file, offset) pairs and verifies the best-voted candidates by bit
+    agreement over the aligned frames. A copy with its start or end trimmed
+    still matches the original, just at a different offset.
+    """
+
+    def __init__(self):
+        self.file_ids: List[str] = []
+        self._project_ids = np.empty(64, dtype=object)
+        self._starts = np.zeros(64, dtype=np.int64)
+        self._lengths = np.zeros(64, dtype=np.int64)
+        self._codes = np.zeros(1 << 16, dtype=np.uint16)
+        self._code_count = 0
+
+        # Index entries pack (file index << 32 | frame), sorted by code, with
+        # each code's bucket located through a table of bucket boundaries
+        self._index_codes = np.zeros(0, dtype=np.uint16)
+        self._index_entries = np.zeros(0, dtype=np.int64)
+        self._bucket_bounds = np.zeros((1 << 16) + 1, dtype=np.int64)
+        self._pending_codes = np.zeros(MERGE_SIZE, dtype=np.uint16)
+        self._pending_entries = np.zeros(MERGE_SIZE, dtype=np.int64)
+        self._pending_count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.file_ids)
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "FingerprintIndex":
+        """Build an index from repository rows with id, project_id and fingerprint bytes"""
+        index = cls()
+        codes = []
+        entries = []
+        for record in records:
+            if record["fingerprint"] and len(record["fingerprint"]) % 2 == 0:
+                fingerprint = np.frombuffer(record["fingerprint"], dtype="<u2")
+                record_codes, record_entries = index._store(record["id"], record["project_id"], fingerprint)
+                codes.append(record_codes)
+                entries.append(record_entries)
+        if codes:
+            index._merge(np.concatenate(codes), np.concatenate(entries))
+        return index
+
+    def add(self, file_id: str, project_id: str, fingerprint: np.ndarray) -> None:
+        codes, entries = self._store(file_id, project_id, fingerprint)
+        if self._pending_count + len(codes) > MERGE_SIZE:
+            self._merge_pending()
+        if len(codes) > MERGE_SIZE:
+            self._merge(codes, entries)
+            return
+        end = self._pending_count + len(codes)
+        self._pending_codes[self._pending_count:end] = codes
+        self._pending_entries[self._pending_count:end] = entries
+        self._pending_count = end
+
+    def _store(self, file_id: str, project_id: str, fingerprint: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Append a fingerprint to the buffers and return the codes and entries to index"""
+        file_index = len(self.file_ids)
+        if file_index == len(self._starts):
+            self._project_ids = self._grow(self._project_ids, file_index * 2)
+            self._starts = self._grow(self._starts, file_index * 2)
+            self._lengths = self._grow(self._lengths, file_index * 2)
+        if self._code_count + len(fingerprint) > len(self._codes):
+            self._codes = self._grow(self._codes, max(len(self._codes) * 2, self._code_count + len(fingerprint)))
+
+        start = self._code_count
+        self._codes[start:start + len(fingerprint)] = fingerprint
+        self._code_count += len(fingerprint)
+        self.file_ids.append(file_id)
+        self._project_ids[file_index] = project_id
+        self._starts[file_index] = start
+        self._lengths[file_index] = len(fingerprint)
+
+        frames = np.arange(0, len(fingerprint), INDEX_STRIDE)
+        frames = frames[~np.isin(fingerprint[frames], IGNORED_CODES)]
+        return fingerprint[frames], (file_index << 32) + frames
+
+    def query(self, fingerprint: np.ndarray, threshold: float, project_id: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Most similar indexed file at or above `threshold`, optionally within one project"""
+        frames = np.flatnonzero(~np.isin(fingerprint, IGNORED_CODES))
+        query_codes = (fingerprint[frames, None] ^ BIT_FLIPS[None, :]).ravel()
+        query_frames = np.repeat(frames, len(BIT_FLIPS))
+
+        pending_codes = self._pending_codes[:self._pending_count]
+        pending_order = np.argsort(pending_codes, kind="stable")
+        pending_first = np.searchsorted(pending_codes[pending_order], query_codes, side="left")
+        pending_last = np.searchsorted(pending_codes[pending_order], query_codes, side="right")
+        # Each hit votes for (file, offset) as entry - query frame, offset biased to stay positive
+        votes = np.concatenate([
+            self._lookup(
+                self._index_entries,
+                self._bucket_bounds[query_codes],
+                self._bucket_bounds[query_codes.astype(np.int64) + 1],
+                query_frames
+            ),
+            self._lookup(self._pending_entries[:self._pending_count][pending_order], pending_first, pending_last, query_frames)
+        ])
+        if len(votes) == 0:
+            return None
+        votes, counts = np.unique(votes, return_counts=True)
+
+        best = None
+        verified = set()
+        for vote in np.argsort(-counts, kind="stable"):
+            if counts[vote] < MIN_HITS or len(verified) >= MAX_CANDIDATES:
+                break
+            file_index = int(votes[vote] >> 32)
+            if file_index in verified or (project_id is not None and self._project_ids[file_index] != project_id):
+                continue
+            verified.add(file_index)
+
+            offset = int(votes[vote] & 0xFFFFFFFF) - (1 << 31)
+            start = self._starts[file_index]
+            candidate = self._codes[start:start + self._lengths[file_index]]
+            for shift in range(-2, 3):
+                similarity = fingerprint_similarity(fingerprint, candidate, offset + shift)
+                if similarity is not None and similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (self.file_ids[file_index], similarity)
+        return best
+
+    def query_or_add(self, file_id: str, project_id: str, fingerprint: np.ndarray, threshold: float, scope: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """Return the file this one duplicates, or index it if there is none.
+
+        Runs under a lock so it can be called from worker threads without two
+        concurrent copies both missing each other.
+        """
+        with self._lock:
+            match = self.query(fingerprint, threshold, scope)
+            if match is None:
+                self.add(file_id, project_id, fingerprint)
+            return match
+
+    @staticmethod
+    def _lookup(entries: np.ndarray, first: np.ndarray, last: np.ndarray, query_frames: np.ndarray) -> np.ndarray:
+        """Votes for every index entry in the buckets [first, last) matched by each query frame"""
+        counts = last - first
+        counts[counts > MAX_BUCKET_SIZE] = 0
+        total = int(counts.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int64)
+        # Index of every matching entry: each bucket's first entry plus 0..count-1
+        bucket_offsets = np.cumsum(counts) - counts
+        matched = entries[np.repeat(first - bucket_offsets, counts) + np.arange(total)]
+        return matched + (1 << 31) - np.repeat(query_frames, counts)
+
+    def _merge_pending(self) -> None:
+        self._merge(self._pending_codes[:self._pending_count], self._pending_entries[:self._pending_count])
+        self._pending_count = 0
+
+    def _merge(self, codes: np.ndarray, entries: np.ndarray) -> None:
+        codes = np.concatenate([self._index_codes, codes])
+        order = np.argsort(codes, kind="stable")  # radix sort for 16-bit codes
+        self._index_codes = codes[order]
+        self._index_entries = np.concatenate([self._index_entries, entries])[order]
+        self._bucket_bounds = np.searchsorted(self._index_codes, np.arange((1 << 16) + 1), side="left")
+
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        grown = np.zeros(size, dtype=array.dtype) if array.dtype != object else np.empty(size, dtype=object)
+        grown[:len(array)] = array
+        return grown
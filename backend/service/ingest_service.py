@@ -0,0 +1,384 @@
+from typing import Dict, Any, Optional, Iterator, AsyncIterator
+from math import gcd, ceil
+from pathlib import Path
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import time
+import uuid
+import numpy as np
+import soundfile as sf
+from scipy.signal import firwin, resample_poly
+from repository.project_repository import AudioFileStatus, IProjectRepository
+
+logger = logging.getLogger(__name__)
+
+# Both ASR models expect 16 kHz mono input
+CANONICAL_SAMPLE_RATE = 16000
+BLOCK_FRAMES = 65536
+SUPPORTED_EXTENSIONS = {".wav", ".flac", ".ogg", ".opus", ".mp3", ".m4a", ".aac", ".webm"}
+SUBTYPE_BIT_DEPTHS = {"PCM_S8": 8, "PCM_U8": 8, "PCM_16": 16, "PCM_24": 24, "PCM_32": 32, "FLOAT": 32, "DOUBLE": 64}
+
+
+class UnsupportedAudioError(Exception):
+    """Raised when an upload cannot be decoded as audio"""
+    pass
+
+class UploadNotFoundError(Exception):
+    """Raised for unknown, expired or foreign upload IDs"""
+    pass
+
+class UploadSizeError(Exception):
+    """Raised when an upload exceeds the size limit or its declared size"""
+    pass
+
+class UploadOffsetError(Exception):
+    """Raised when a chunk does not start where the upload currently ends"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class StreamingResampler:
+    """Polyphase resampler that can be fed arbitrary-sized blocks.
+
+    Each block is resampled together with enough neighbouring input to cover
+    the filter, and only the samples whose filter support lies inside the
+    buffer are emitted, so the concatenated output matches resampling the
+    whole signal at once with `resample_poly`.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int):
+        divisor = gcd(source_rate, target_rate)
+        self.up = target_rate // divisor
+        self.down = source_rate // divisor
+        self._samples_in = 0
+        self._samples_out = 0
+        if self.up == self.down:
+            return
+
+        # Same filter resample_poly designs by default, computed once
+        max_rate = max(self.up, self.down)
+        half_length = 10 * max_rate
+        self._filter = firwin(2 * half_length + 1, 1 / max_rate, window=("kaiser", 5.0))
+        # Input samples of context kept on each side, a multiple of `down` so
+        # block boundaries fall on whole output samples
+        self._context = self.down * (ceil(half_length / self.up / self.down) + 1)
+        self._buffer = np.zeros(self._context, dtype=np.float32)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        self._samples_in += len(block)
+        if self.up == self.down:
+            return block
+        self._buffer = np.concatenate([self._buffer, block])
+        return self._resample_ready()
+
+    def flush(self) -> np.ndarray:
+        """Resample whatever input is left, zero-padded like resample_poly"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        expected = ceil(self._samples_in * self.up / self.down) - self._samples_out
+        remaining = len(self._buffer) - self._context
+        padded_length = self._context + ceil(max(remaining, 0) / self.down) * self.down + self._context
+        self._buffer = np.pad(self._buffer, (0, padded_length - len(self._buffer)))
+        return self._resample_ready()[:expected]
+
+    def _resample_ready(self) -> np.ndarray:
+        core = (len(self._buffer) - 2 * self._context) // self.down * self.down
+        if core <= 0:
+            return np.zeros(0, dtype=np.float32)
+        window = self._buffer[:core + 2 * self._context]
+        resampled = resample_poly(window, self.up, self.down, window=self._filter)
+        start = self._context * self.up // self.down
+        output = resampled[start:start + core * self.up // self.down].astype(np.float32)
+        self._buffer = self._buffer[core:]
+        self._samples_out += len(output)
+        return output
+
+
+def probe_audio(path: Path) -> Dict[str, Any]:
+    """Read format, sample rate, channels, bit depth and duration of an audio file.
+
+    Uses libsndfile for the formats it reads (WAV, FLAC, OGG, MP3) and falls
+    back to ffprobe for other containers such as M4A/AAC and WebM.
+    """
+    try:
+        info = sf.info(str(path))
+        return {
+            "decoder": "soundfile",
+            "format": info.format.lower(),
+            "sample_rate": info.samplerate,
+            "channels": info.channels,
+            "bit_depth": SUBTYPE_BIT_DEPTHS.get(info.subtype),
+            "duration": info.duration
+        }
+    except RuntimeError:
+        pass
+
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error", "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name,sample_rate,channels,bits_per_raw_sample:format=duration",
+                "-of", "json", str(path)
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        probe = json.loads(result.stdout)
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        raise UnsupportedAudioError(f"Could not read audio file: {str(e)}")
+
+    if not probe.get("streams"):
+        raise UnsupportedAudioError("File contains no audio stream")
+    stream = probe["streams"][0]
+    bit_depth = stream.get("bits_per_raw_sample")
+    return {
+        "decoder": "ffmpeg",
+        "format": stream.get("codec_name"),
+        "sample_rate": int(stream["sample_rate"]),
+        "channels": int(stream["channels"]),
+        "bit_depth": int(bit_depth) if bit_depth else None,
+        "duration": float(probe.get("format", {}).get("duration", 0))
+    }
+
+
+def _decode_blocks(path: Path, decoder: str) -> Iterator[np.ndarray]:
+    """Yield mono float32 blocks at the source sample rate"""
+    if decoder == "soundfile":
+        for block in sf.blocks(str(path), blocksize=BLOCK_FRAMES, dtype="float32", always_2d=True):
+            yield block.mean(axis=1)
+        return
+
+    process = subprocess.Popen(
+        ["ffmpeg", "-v", "error", "-i", str(path), "-f", "f32le", "-ac", "1", "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    try:
+        while True:
+            data = process.stdout.read(BLOCK_FRAMES * 4)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32)
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors="replace")
+        process.stderr.close()
+        if process.wait() != 0:
+            raise UnsupportedAudioError(f"Failed to decode audio: {stderr.strip()}")
+
+
+def normalize_audio(source_path: Path, target_path: Path, probe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Decode any supported file into canonical 16 kHz mono 16-bit PCM WAV.
+
+    The source is decoded, downmixed and resampled block by block, so memory
+    use does not grow with the length of the recording. Returns the probed
+    source metadata.
+    """
+    probe = probe or probe_audio(source_path)
+    resampler = StreamingResampler(probe["sample_rate"], CANONICAL_SAMPLE_RATE)
+    try:
+        with sf.SoundFile(str(target_path), "w", samplerate=CANONICAL_SAMPLE_RATE, channels=1, subtype="PCM_16", format="WAV") as output:
+            for block in _decode_blocks(source_path, probe["decoder"]):
+                output.write(np.clip(resampler.process(block), -1.0, 1.0))
+            output.write(np.clip(resampler.flush(), -1.0, 1.0))
+            frames = output.frames
+    except RuntimeError as e:
+        raise UnsupportedAudioError(f"Failed to decode audio: {str(e)}")
+
+    if frames == 0:
+        raise UnsupportedAudioError("File contains no audio")
+    return {**probe, "duration": probe["duration"] or frames / CANONICAL_SAMPLE_RATE}
+
+
+class IngestService:
+    """Chunked, resumable uploads that only ever store normalized audio.
+
+    A client opens an upload for a project, sends the file in chunks, each
+    tagged with the byte offset it starts at, and completes it. Chunks are
+    staged on local disk, so an interrupted client can ask for the current
+    offset and resume. On completion the file is probed and streamed into
+    canonical WAV; only that WAV is uploaded to storage and registered as a
+    pending audio file, so undecodable uploads are rejected before any
+    pipeline work is spent on them.
+
+    Decoding deliberately waits for the last chunk instead of running as
+    chunks arrive: chunks can be retried or resumed across requests, and
+    containers such as M4A/MP4 may keep their index at the end of the file, so
+    the decoders need the complete, seekable file. The decode itself is still
+    block-wise and the WAV is uploaded straight from disk, so memory stays
+    bounded.
+    """
+
+    def __init__(self, repository: IProjectRepository):
+        self.repository = repository
+        self.max_file_size = int(os.getenv("INGEST_MAX_FILE_SIZE", str(2 * 1024 ** 3)))
+        self.max_chunk_size = int(os.getenv("INGEST_MAX_CHUNK_SIZE", str(64 * 1024 ** 2)))
+        self.upload_ttl = float(os.getenv("INGEST_UPLOAD_TTL", "86400"))  # seconds before idle uploads expire
+
+        backend_dir = Path(__file__).parent.parent
+        self.upload_path = backend_dir / "temp-folder" / "uploads"
+        self.upload_path.mkdir(parents=True, exist_ok=True)
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def create_upload(self, project_id: str, user_id: str, file_name: str, file_size: int) -> Dict[str, Any]:
+        """Open an upload session for a file in a project"""
+        await self.repository.get_project_by_id(project_id, user_id)
+
+        file_name = Path(file_name).name
+        if Path(file_name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+            raise UnsupportedAudioError(f"Unsupported audio format: {file_name}")
+        if file_size <= 0 or file_size > self.max_file_size:
+            raise UploadSizeError(f"File size must be between 1 and {self.max_file_size} bytes")
+
+        self._purge_expired()
+        upload_id = str(uuid.uuid4())
+        session = {
+            "upload_id": upload_id,
+            "project_id": project_id,
+            "user_id": user_id,
+            "file_name": file_name,
+            "file_size": file_size
+        }
+        self._session_file(upload_id).write_text(json.dumps(session))
+        self._data_file(upload_id).touch()
+        logger.info(f"Opened upload {upload_id} for {file_name} ({file_size} bytes) in project {project_id}")
+        return {"upload_id": upload_id, "offset": 0, "file_size": file_size}
+
+    async def get_upload(self, upload_id: str, user_id: str) -> Dict[str, Any]:
+        """Current offset of an upload, for resuming"""
+        session = self._load_session(upload_id, user_id)
+        return {
+            "upload_id": upload_id,
+            "offset": self._data_file(upload_id).stat().st_size,
+            "file_size": session["file_size"]
+        }
+
+    async def append_chunk(self, upload_id: str, user_id: str, offset: int, chunk: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """Append a chunk that starts at `offset` and return the new offset.
+
+        The chunk body is written to the staged file as it arrives, so a
+        request never has to fit in memory. A chunk over `max_chunk_size` or
+        past the declared file size is rolled back and rejected.
+        """
+        async with self._lock(upload_id):
+            session = self._load_session(upload_id, user_id)
+            data_file = self._data_file(upload_id)
+            current = data_file.stat().st_size
+            if offset != current:
+                raise UploadOffsetError(current)
+
+            limit = min(self.max_chunk_size, session["file_size"] - current)
+            received = 0
+            with open(data_file, "ab") as f:
+                try:
+                    async for data in chunk:
+                        received += len(data)
+                        if received > limit:
+                            raise UploadSizeError(
+                                f"Chunk exceeds {self.max_chunk_size} bytes or the declared file size"
+                            )
+                        await asyncio.to_thread(f.write, data)
+                except UploadSizeError:
+                    f.truncate(current)
+                    raise
+            # A dropped connection keeps what was written, and the client resumes from there
+            return {"upload_id": upload_id, "offset": current + received, "file_size": session["file_size"]}
+
+    async def complete_upload(self, upload_id: str, user_id: str) -> Dict[str, Any]:
+        """Normalize a fully received upload, store it and register the audio file"""
+        async with self._lock(upload_id):
+            session = self._load_session(upload_id, user_id)
+            data_file = self._data_file(upload_id)
+            current = data_file.stat().st_size
+            if current != session["file_size"]:
+                raise UploadOffsetError(current)
+
+            wav_file = self.upload_path / f"{upload_id}.wav"
+            try:
+                try:
+                    probe = await asyncio.to_thread(probe_audio, data_file)
+                    source = await asyncio.to_thread(normalize_audio, data_file, wav_file, probe)
+                except UnsupportedAudioError:
+                    self._remove_upload(upload_id)
+                    raise
+
+                wav_size = wav_file.stat().st_size
+
+                # Same `project_id/<timestamp>-<name>` layout the frontend used
+                stem = Path(session["file_name"]).stem
+                storage_path = f"{session['project_id']}/{int(time.time() * 1000)}-{stem}.wav"
+                await self.repository.upload_audio_file_from_path(storage_path, wav_file, "audio/wav")
+
+                audio_file = await self.repository.create_audio_file(session["project_id"], user_id, {
+                    "file_name": f"{stem}.wav",
+                    "file_path_raw": storage_path,
+                    "file_size": wav_size,
+                    "duration": int(round(source["duration"])),
+                    "sample_rate": CANONICAL_SAMPLE_RATE,
+                    "channels": 1,
+                    "bit_depth": 16,
+                    "format": "wav",
+                    "source_format": source["format"],
+                    "source_sample_rate": source["sample_rate"],
+                    "source_channels": source["channels"],
+                    "source_bit_depth": source["bit_depth"],
+                    "transcription_status": AudioFileStatus.PENDING.value
+                })
+                logger.info(
+                    f"Ingested {session['file_name']} ({source['format']}, {source['sample_rate']} Hz, "
+                    f"{source['channels']} ch) as {storage_path}"
+                )
+                self._remove_upload(upload_id)
+                return audio_file
+            finally:
+                # Staged data is kept on storage errors so the client can retry completing
+                if wav_file.exists():
+                    wav_file.unlink()
+
+    async def cancel_upload(self, upload_id: str, user_id: str) -> None:
+        """Discard an upload and its staged data"""
+        async with self._lock(upload_id):
+            self._load_session(upload_id, user_id)
+            self._remove_upload(upload_id)
+
+    def _session_file(self, upload_id: str) -> Path:
+        return self.upload_path / f"{upload_id}.json"
+
+    def _data_file(self, upload_id: str) -> Path:
+        return self.upload_path / f"{upload_id}.part"
+
+    def _load_session(self, upload_id: str, user_id: str) -> Dict[str, Any]:
+        try:
+            uuid.UUID(upload_id)
+            session = json.loads(self._session_file(upload_id).read_text())
+        except (ValueError, OSError):
+            raise UploadNotFoundError(f"Upload not found: {upload_id}")
+        if session["user_id"] != user_id:
+            raise UploadNotFoundError(f"Upload not found: {upload_id}")
+        return session
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(upload_id, asyncio.Lock())
+
+    def _remove_upload(self, upload_id: str) -> None:
+        for path in (self._session_file(upload_id), self._data_file(upload_id)):
+            if path.exists():
+                path.unlink()
+        self._locks.pop(upload_id, None)
+
+    def _purge_expired(self) -> None:
+        """Remove uploads that have not received data within the TTL"""
+        cutoff = time.time() - self.upload_ttl
+        for session_file in self.upload_path.glob("*.json"):
+            upload_id = session_file.stem
+            data_file = self._data_file(upload_id)
+            last_activity = data_file.stat().st_mtime if data_file.exists() else session_file.stat().st_mtime
+            if last_activity < cutoff:
+                logger.info(f"Removing expired upload {upload_id}")
+                self._remove_upload(upload_id)
@@ -0,0 +1,127 @@
+from typing import Dict, Any, Optional, Set, AsyncIterator, Awaitable, Callable
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressService:
+    """In-process fan-out of pipeline events to live subscribers.
+
+    The running pipeline publishes file stage transitions and project progress
+    here instead of writing every update to the database. Each subscriber gets
+    a bounded queue; when a slow client falls behind, its oldest events are
+    dropped so one stalled connection never holds up the pipeline. Project
+    progress events are throttled to at most one per `min_interval` seconds.
+    """
+
+    def __init__(self, min_interval: float = 0.5, queue_size: int = 256):
+        self.min_interval = min_interval
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._last_progress_at: Dict[str, float] = {}
+        self._active: Set[str] = set()
+
+    def start(self, project_id: str) -> None:
+        """Register a run of a project in this process; `close` ends it"""
+        self._active.add(project_id)
+
+    def publish_file_stage(self, project_id: str, file_id: str, stage: str, error_message: Optional[str] = None) -> None:
+        """Publish a stage transition for a single file"""
+        event = {"type": "file", "file_id": file_id, "stage": stage}
+        if error_message:
+            event["error_message"] = error_message
+        self._publish(project_id, event)
+
+    def publish_progress(self, project_id: str, processed: int, total: int, force: bool = False) -> None:
+        """Publish project progress, throttled unless forced"""
+        progress = int(processed / total * 100) if total > 0 else 100
+        event = {"type": "progress", "progress": progress, "processed": processed, "total": total}
+        self._latest[project_id] = event
+
+        now = time.monotonic()
+        if not force and now - self._last_progress_at.get(project_id, 0) < self.min_interval:
+            return
+        self._last_progress_at[project_id] = now
+        self._publish(project_id, event)
+
+    def publish_status(self, project_id: str, status: str) -> None:
+        """Publish a project status change; terminal statuses end the stream"""
+        self._publish(project_id, {"type": "status", "status": status})
+
+    def close(self, project_id: str) -> None:
+        """Signal all subscribers of a project that the run has finished"""
+        for queue in self._subscribers.get(project_id, set()):
+            self._put(queue, None)
+        self._active.discard(project_id)
+        self._latest.pop(project_id, None)
+        self._last_progress_at.pop(project_id, None)
+
+    async def subscribe(
+        self,
+        project_id: str,
+        get_project: Callable[[], Awaitable[Dict[str, Any]]],
+        keepalive: Optional[float] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield events for a project until the run finishes or the client goes away.
+
+        The project's stored status and progress are sent first, read through
+        `get_project` after the subscription is registered so a run finishing
+        in between can't be missed. If the project is not in progress, or no run
+        of it is active in this process (e.g. one left `in_progress` by a
+        crashed backend), nothing will close the stream, so it ends right away.
+        When `keepalive` is set, `None` is yielded after that many idle seconds.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(project_id, set()).add(queue)
+        logger.info(f"Progress subscriber added for project {project_id}")
+        try:
+            project = await get_project()
+            status = project.get("status")
+            # Bring late joiners up to date, preferring the unthrottled in-memory progress
+            yield self._latest.get(project_id) or {"type": "progress", "progress": project.get("progress") or 0}
+            yield {"type": "status", "status": status}
+            if status != "in_progress" or project_id not in self._active:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    break
+                yield event
+        finally:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[project_id]
+            logger.info(f"Progress subscriber removed for project {project_id}")
+
+    async def stream_events(
+        self,
+        project_id: str,
+        get_project: Callable[[], Awaitable[Dict[str, Any]]],
+        keepalive: float = 15.0
+    ) -> AsyncIterator[str]:
+        """Format subscriber events as server-sent events, with keep-alive comments"""
+        async for event in self.subscribe(project_id, get_project, keepalive):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    def _publish(self, project_id: str, event: Dict[str, Any]) -> None:
+        for queue in self._subscribers.get(project_id, set()):
+            self._put(queue, event)
+
+    def _put(self, queue: asyncio.Queue, event: Optional[Dict[str, Any]]) -> None:
+        if queue.full():
+            # Drop the oldest event rather than blocking the pipeline on a slow client
+            queue.get_nowait()
+        queue.put_nowait(event)
@@ -7,18 +7,45 @@ import numpy as np
 import torch
 from df.enhance import enhance, init_df
 import base64
-import requests
+import io
 import os
 import shutil
+import asyncio
 from repository.project_repository import ProjectStatus, AudioFileStatus, IProjectRepository
+from service.progress_service import ProgressService
+from service.scheduler_service import SchedulerService
+from service.asr_router_service import AsrRouterService
+from service.fingerprint_service import compute_fingerprint, FingerprintIndex
+from service.ingest_service import normalize_audio
 
 logger = logging.getLogger(__name__)
 
+class DuplicateAudioError(Exception):
+    """Raised to skip a file that is a near-duplicate of one already processed"""
+    pass
+
 class ProjectService:
-    def __init__(self, repository: IProjectRepository):
+    def __init__(
+        self,
+        repository: IProjectRepository,
+        progress_service: Optional[ProgressService] = None,
+        scheduler: Optional[SchedulerService] = None,
+        asr_router: Optional[AsrRouterService] = None
+    ):
         self.repository = repository
-        self.asr_service_url = os.getenv("ASR_SERVICE_URL", "http://localhost:8000")
-        logger.info(f"Using ASR service URL: {self.asr_service_url}")
+        self.progress_service = progress_service
+        self.scheduler = scheduler
+        self.asr_router = asr_router or AsrRouterService.from_env()
+
+        # Near-duplicate detection: "flag" records duplicate_of, "skip" also skips
+        # denoise + ASR for the copy, "off" disables fingerprinting
+        self.duplicate_action = os.getenv("DUPLICATE_ACTION", "flag")
+        self.duplicate_scope = os.getenv("DUPLICATE_SCOPE", "project")  # or "tenant"
+        self.duplicate_threshold = float(os.getenv("DUPLICATE_THRESHOLD", "0.75"))  # fraction of matching fingerprint bits
+
+        # Split transcribed files into child entries at aligned segment boundaries
+        self.split_segments = os.getenv("SPLIT_SEGMENTS", "false").lower() == "true"
+        self.segment_padding = float(os.getenv("SEGMENT_PADDING", "0.1"))  # seconds kept around each segment
         
         # Define fixed paths relative to backend directory
         backend_dir = Path(__file__).parent.parent  # Get backend directory path
@@ -48,14 +75,22 @@ class ProjectService:
 
     async def process_project(self, project_id: str, user_id: str):
         """Process a project's audio files"""
+        # Verify project ownership, and fail before touching any file if its
+        # ASR model has no registered endpoint
+        project = await self.repository.get_project_by_id(project_id, user_id)
+        self.asr_router.check_model(project.get("asr_model"))
+
         try:
             logger.info(f"Starting processing for project {project_id} by user {user_id}")
+            if self.progress_service:
+                self.progress_service.start(project_id)
             
-            # Verify project ownership and set initial state
-            project = await self._initialize_project(project_id, user_id)
+            # Set initial state
+            await self._initialize_project(project_id, user_id, project)
+            self._publish_status(project_id, ProjectStatus.IN_PROGRESS)
             
             # Process audio files
-            result = await self._process_project_audio_files(project_id, user_id)
+            result = await self._process_project_audio_files(project_id, user_id, project.get("asr_model"))
             
             # Update final project status
             await self._finalize_project(project_id, user_id, result)
@@ -73,13 +108,14 @@ class ProjectService:
                 await self.repository.update_project_status(project_id, user_id, ProjectStatus.ARCHIVED)
             except Exception as status_error:
                 logger.error(f"Failed to update project status after error: {str(status_error)}")
+            self._publish_status(project_id, ProjectStatus.ARCHIVED)
             raise e
+        finally:
+            if self.progress_service:
+                self.progress_service.close(project_id)
 
-    async def _initialize_project(self, project_id: str, user_id: str) -> Dict[str, Any]:
-        """Verify project ownership and set initial state"""
-        # Verify project ownership
-        project = await self.repository.get_project_by_id(project_id, user_id)
-        
+    async def _initialize_project(self, project_id: str, user_id: str, project: Dict[str, Any]) -> Dict[str, Any]:
+        """Set the initial state of an owned project"""
         # Log current project status
         logger.info(f"Current project status: {project.get('status')}")
         
@@ -88,27 +124,52 @@ class ProjectService:
         
         return project
 
-    async def _process_project_audio_files(self, project_id: str, user_id: str) -> Dict[str, Any]:
+    async def _process_project_audio_files(self, project_id: str, user_id: str, asr_model: Optional[str] = None) -> Dict[str, Any]:
         """Process all pending audio files for a project"""
         # Fetch pending audio files for this project
         pending_files = await self.repository.get_pending_audio_files(project_id)
         logger.info(f"Found {len(pending_files)} pending files to process")
+
+        # Load fingerprints of files already processed in this project (or for this user)
+        fingerprint_index = None
+        if self.duplicate_action != "off":
+            scope = project_id if self.duplicate_scope == "project" else None
+            fingerprint_index = FingerprintIndex.from_records(await self.repository.get_audio_file_fingerprints(user_id, scope))
+            logger.info(f"Loaded {len(fingerprint_index)} fingerprints for duplicate detection")
         
         # Process each audio file
         processed_count = 0
-        for i, audio_file in enumerate(pending_files):
+        finished_count = 0
+
+        async def process_file(i: int, audio_file: Dict[str, Any]) -> None:
+            nonlocal processed_count, finished_count
             file_id = audio_file["id"]
             file_path = audio_file["file_path_raw"]
             
             logger.info(f"[{i+1}/{len(pending_files)}] Processing file {file_id}, path: {file_path}")
             
             # Process the file
-            processed = await self._handle_audio_file(file_id, file_path)
+            if self.scheduler:
+                processed = await self.scheduler.run(
+                    user_id,
+                    project_id,
+                    lambda: self._handle_audio_file(file_id, file_path, project_id, asr_model, fingerprint_index)
+                )
+            else:
+                processed = await self._handle_audio_file(file_id, file_path, project_id, asr_model, fingerprint_index)
             if processed:
                 processed_count += 1
             
             # Update project progress after each file
-            await self._update_progress(project_id, i, len(pending_files))
+            finished_count += 1
+            await self._update_progress(project_id, finished_count - 1, len(pending_files))
+
+        if self.scheduler:
+            # Queue every file; the scheduler decides how many run at once
+            await asyncio.gather(*(process_file(i, audio_file) for i, audio_file in enumerate(pending_files)))
+        else:
+            for i, audio_file in enumerate(pending_files):
+                await process_file(i, audio_file)
         
         # Determine final status
         final_status = ProjectStatus.COMPLETED if processed_count == len(pending_files) else ProjectStatus.ARCHIVED
@@ -122,6 +183,15 @@ class ProjectService:
     async def _update_progress(self, project_id: str, processed_index: int, total_files: int) -> None:
         """Update project progress percentage"""
         progress = int((processed_index + 1) / total_files * 100) if total_files > 0 else 100
+        previous_progress = int(processed_index / total_files * 100) if total_files > 0 else 0
+
+        if self.progress_service:
+            self.progress_service.publish_progress(project_id, processed_index + 1, total_files, force=progress == 100)
+        # The frontend follows projects.progress through realtime, so persist every
+        # percentage step, but skip writes that wouldn't change the stored value
+        if progress == previous_progress:
+            return
+
         await self.repository.update_project_progress(project_id, progress)
         logger.info(f"Updated project progress to {progress}%")
 
@@ -132,24 +202,57 @@ class ProjectService:
         await self.repository.update_project_status(project_id, user_id, final_status)
         if final_status == ProjectStatus.COMPLETED:
             await self.repository.update_project_progress(project_id, 100)
+        self._publish_status(project_id, final_status)
         
         logger.info(f"Processing completed with status: {final_status}")
 
-    async def _handle_audio_file(self, file_id: str, file_path: str) -> bool:
+    def _publish_status(self, project_id: str, status: ProjectStatus) -> None:
+        """Publish a project status change to live subscribers"""
+        if self.progress_service:
+            self.progress_service.publish_status(project_id, status.value)
+
+    def _publish_stage(self, project_id: Optional[str], file_id: str, stage: str, error_message: Optional[str] = None) -> None:
+        """Publish a file stage transition to live subscribers"""
+        if self.progress_service and project_id:
+            self.progress_service.publish_file_stage(project_id, file_id, stage, error_message)
+
+    async def _handle_audio_file(
+        self,
+        file_id: str,
+        file_path: str,
+        project_id: Optional[str] = None,
+        asr_model: Optional[str] = None,
+        fingerprint_index: Optional[FingerprintIndex] = None
+    ) -> bool:
         """Process a single audio file and handle exceptions"""
         try:
             # Update file status to PROCESSING
             await self.repository.update_audio_file_status(file_id, AudioFileStatus.PROCESSING)
             
             # Process the audio file (noise reduction + transcription)
-            success = await self._process_audio_file(file_id, file_path)
+            success = await self._process_audio_file(file_id, file_path, project_id, asr_model, fingerprint_index)
+            self._publish_stage(project_id, file_id, AudioFileStatus.COMPLETED.value)
             return success
+        except DuplicateAudioError as e:
+            # Deliberately skipped, so it doesn't count against the project
+            logger.info(f"Skipping file {file_id}: {str(e)}")
+            await self.repository.update_audio_file_status(file_id, AudioFileStatus.SKIPPED, str(e))
+            self._publish_stage(project_id, file_id, AudioFileStatus.SKIPPED.value, str(e))
+            return True
         except Exception as e:
             logger.error(f"Error processing file {file_id}: {str(e)}")
             await self.repository.update_audio_file_status(file_id, AudioFileStatus.FAILED, str(e))
+            self._publish_stage(project_id, file_id, AudioFileStatus.FAILED.value, str(e))
             return False
 
-    async def _process_audio_file(self, file_id: str, file_path: str) -> bool:
+    async def _process_audio_file(
+        self,
+        file_id: str,
+        file_path: str,
+        project_id: Optional[str] = None,
+        asr_model: Optional[str] = None,
+        fingerprint_index: Optional[FingerprintIndex] = None
+    ) -> bool:
         """Process a single audio file with noise reduction and transcription"""
         raw_file_path = None
         cleaned_file_path = None
@@ -161,6 +264,7 @@ class ProjectService:
             original_filename = path_parts[-1]  # Get the last part of the path
             
             # 1. Download and save to raw directory
+            self._publish_stage(project_id, file_id, "downloading")
             file_data = await self.repository.get_audio_file_content(file_path)
             logger.info(f"Downloaded file size: {len(file_data)} bytes")
             
@@ -169,13 +273,30 @@ class ProjectService:
             with open(raw_file_path, "wb") as f:
                 f.write(file_data)
             logger.info(f"Saved raw file to: {raw_file_path}")
+
+            # Files uploaded before server-side ingestion may not be WAV; convert
+            # them now rather than failing in the ASR service after denoising
+            if raw_file_path.suffix.lower() != ".wav":
+                self._publish_stage(project_id, file_id, "normalizing")
+                source_file_path = raw_file_path
+                raw_file_path = self.raw_path / f"{file_id}_{Path(original_filename).stem}.wav"
+                try:
+                    await asyncio.to_thread(normalize_audio, source_file_path, raw_file_path)
+                finally:
+                    source_file_path.unlink()
+                logger.info(f"Normalized raw file to: {raw_file_path}")
+
+            # Check for near-duplicates before the expensive stages run
+            if fingerprint_index is not None:
+                duplicate_of = await self._check_duplicate(file_id, project_id, raw_file_path, fingerprint_index)
+                if duplicate_of and self.duplicate_action == "skip":
+                    raise DuplicateAudioError(f"Skipped: near-duplicate of {duplicate_of}")
             
             # 2. Apply noise reduction and save to cleaned directory
             # Add _cleaned suffix before the extension
-            filename_parts = original_filename.rsplit('.', 1)
-            cleaned_filename = f"{filename_parts[0]}_cleaned.{filename_parts[1]}"
-            cleaned_file_path = self.cleaned_path / f"{file_id}_{cleaned_filename}"
+            cleaned_file_path = self.cleaned_path / f"{file_id}_{Path(original_filename).stem}_cleaned.wav"
             
+            self._publish_stage(project_id, file_id, "denoising")
             noise_reduction_success = await self._clean_audio(raw_file_path, cleaned_file_path)
             
             if not noise_reduction_success:
@@ -184,11 +305,12 @@ class ProjectService:
                 shutil.copy(raw_file_path, cleaned_file_path)
             
             # 3. Upload cleaned file to storage and update database
-            cleaned_storage_path = self._generate_cleaned_storage_path(file_path, original_filename)
+            cleaned_storage_path = self._generate_cleaned_storage_path(file_path)
             with open(cleaned_file_path, "rb") as f:
                 cleaned_audio_data = f.read()
             
             logger.info(f"Uploading cleaned file to storage at path: {cleaned_storage_path}")
+            self._publish_stage(project_id, file_id, "uploading")
             await self.repository.upload_audio_file(
                 cleaned_storage_path,
                 cleaned_audio_data,
@@ -200,12 +322,24 @@ class ProjectService:
             logger.info(f"Updated audio file record with cleaned path: {cleaned_storage_path}")
             
             # 4. Get transcription from cleaned audio and update record
-            transcription = await self._get_transcription(cleaned_file_path)
+            self._publish_stage(project_id, file_id, "transcribing")
+            transcription_result = await self._get_transcription(cleaned_file_path, asr_model)
             await self.repository.update_audio_file_transcription(
                 file_id, 
-                transcription,
-                AudioFileStatus.COMPLETED
+                transcription_result["transcription"],
+                AudioFileStatus.COMPLETED,
+                transcription_result.get("confidence")
             )
+
+            # 5. Optionally cut the file into training-sized child entries
+            segments = transcription_result.get("segments") or []
+            if self.split_segments and len(segments) > 1:
+                self._publish_stage(project_id, file_id, "splitting")
+                try:
+                    await self._split_into_segments(file_id, file_path, original_filename, raw_file_path, cleaned_file_path, segments)
+                except Exception as e:
+                    # The transcript is already stored; keep the file completed and unsplit
+                    logger.error(f"Failed to split file {file_id} into segments, keeping it whole: {str(e)}")
             
             return True
             
@@ -222,24 +356,106 @@ class ProjectService:
                 cleaned_file_path.unlink()
                 logger.info(f"Cleaned up cleaned file: {cleaned_file_path}")
 
-    def _generate_cleaned_storage_path(self, original_file_path: str, original_filename: str) -> str:
-        """Generate storage path for cleaned audio file"""
-        # Split the path into parts
-        path_parts = original_file_path.split('/')
-        
-        # Get the project_id and directory structure
-        if len(path_parts) >= 2:
-            # Split filename and add _cleaned before extension
-            filename_parts = original_filename.rsplit('.', 1)
-            cleaned_filename = f"{filename_parts[0]}_cleaned.{filename_parts[1]}"
-            
-            # Keep the same directory structure but with cleaned filename
-            path_parts[-1] = cleaned_filename
-            return '/'.join(path_parts)
-        else:
-            # Fallback if path structure is unexpected
-            filename_parts = original_filename.rsplit('.', 1)
-            return f"{filename_parts[0]}_cleaned.{filename_parts[1]}"
+    async def _check_duplicate(self, file_id: str, project_id: str, raw_file_path: Path, fingerprint_index: FingerprintIndex) -> Optional[str]:
+        """Fingerprint the raw audio, record it and return the ID of a near-duplicate if one exists"""
+        try:
+            audio, sample_rate = await asyncio.to_thread(sf.read, raw_file_path, dtype="float32")
+            fingerprint = await asyncio.to_thread(compute_fingerprint, audio, sample_rate)
+        except Exception as e:
+            logger.warning(f"Could not fingerprint file {file_id}: {str(e)}")
+            return None
+
+        scope = project_id if self.duplicate_scope == "project" else None
+        match = await asyncio.to_thread(
+            fingerprint_index.query_or_add, file_id, project_id, fingerprint, self.duplicate_threshold, scope
+        )
+        duplicate_of = None
+        if match:
+            duplicate_of, similarity = match
+            logger.info(f"File {file_id} is a near-duplicate of {duplicate_of} (similarity {similarity:.3f})")
+
+        await self.repository.update_audio_file_fingerprint(file_id, fingerprint.astype("<u2").tobytes(), duplicate_of)
+        return duplicate_of
+
+    async def _split_into_segments(
+        self,
+        file_id: str,
+        file_path: str,
+        original_filename: str,
+        raw_file_path: Path,
+        cleaned_file_path: Path,
+        segments: List[Dict[str, Any]]
+    ) -> None:
+        """Cut raw and cleaned audio at segment boundaries and store each piece as a child entry.
+
+        All or nothing: if any piece fails, the uploaded pieces are removed
+        again and the error is raised.
+        """
+        raw_audio, raw_rate = await asyncio.to_thread(sf.read, raw_file_path)
+        cleaned_audio, cleaned_rate = await asyncio.to_thread(sf.read, cleaned_file_path)
+
+        directory = file_path.rsplit('/', 1)[0] if '/' in file_path else ''
+        stem = Path(original_filename).stem
+        children = []
+        uploaded: List[str] = []
+        try:
+            for index, segment in enumerate(segments, start=1):
+                start = max(0.0, segment["start"] - self.segment_padding)
+                end = segment["end"] + self.segment_padding
+                segment_name = f"{stem}_seg{index:03d}"
+                raw_storage_path = f"{directory}/{segment_name}.wav" if directory else f"{segment_name}.wav"
+                cleaned_storage_path = self._generate_cleaned_storage_path(raw_storage_path)
+
+                raw_bytes = self._encode_wav_slice(raw_audio, raw_rate, start, end)
+                await self.repository.upload_audio_file(raw_storage_path, raw_bytes, "audio/wav")
+                uploaded.append(raw_storage_path)
+                await self.repository.upload_audio_file(
+                    cleaned_storage_path,
+                    self._encode_wav_slice(cleaned_audio, cleaned_rate, start, end),
+                    "audio/wav"
+                )
+                uploaded.append(cleaned_storage_path)
+
+                children.append({
+                    "file_name": f"{segment_name}.wav",
+                    "file_path_raw": raw_storage_path,
+                    "file_path_cleaned": cleaned_storage_path,
+                    "file_size": len(raw_bytes),
+                    "duration": int(round(end - start)),
+                    "sample_rate": raw_rate,
+                    "channels": 1 if raw_audio.ndim == 1 else raw_audio.shape[1],
+                    "format": "wav",
+                    "transcription_content": segment["text"],
+                    "transcription_status": AudioFileStatus.COMPLETED.value,
+                    "confidence": segment.get("confidence"),
+                    "segment_start": start,
+                    "segment_end": end
+                })
+
+            await self.repository.create_child_audio_files(file_id, children)
+        except Exception:
+            try:
+                await self.repository.delete_audio_files(uploaded)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to remove segment files of {file_id}: {str(cleanup_error)}")
+            raise
+        logger.info(f"Split file {file_id} into {len(children)} segments")
+
+    def _encode_wav_slice(self, audio: np.ndarray, sample_rate: int, start: float, end: float) -> bytes:
+        """Encode the audio between `start` and `end` seconds as WAV bytes"""
+        buffer = io.BytesIO()
+        sf.write(buffer, audio[int(start * sample_rate):int(end * sample_rate)], sample_rate, format="WAV")
+        return buffer.getvalue()
+
+    def _generate_cleaned_storage_path(self, original_file_path: str) -> str:
+        """Generate storage path for cleaned audio file next to the raw file.
+
+        The cleaned file is always WAV, whatever the raw file's extension, and
+        names with several dots or none at all are handled.
+        """
+        directory, _, filename = original_file_path.rpartition('/')
+        cleaned_filename = f"{Path(filename).stem}_cleaned.wav"
+        return f"{directory}/{cleaned_filename}" if directory else cleaned_filename
 
     async def _clean_audio(self, input_file_path: Path, output_file_path: Path) -> bool:
         """Apply noise reduction to audio file using DeepFilterNet command-line tool"""
@@ -257,7 +473,9 @@ class ProjectService:
             # Run deepFilter command to output directory
             import subprocess
             command = f"deepfilter {input_file_path} -o {output_dir}"
-            result = subprocess.run(
+            # Run in a thread so the event loop keeps serving requests and progress streams
+            result = await asyncio.to_thread(
+                subprocess.run,
                 command,
                 shell=True,
                 capture_output=True,
@@ -299,14 +517,14 @@ class ProjectService:
             logger.error(f"Error in noise reduction: {str(e)}")
             return False
 
-    async def _get_transcription(self, audio_file_path: Path) -> str:
-        """Get transcription from ASR service"""
+    async def _get_transcription(self, audio_file_path: Path, asr_model: Optional[str] = None) -> Dict[str, Any]:
+        """Get transcription result (text, plus confidence and segments if the model reports them) from ASR service"""
         try:
             # Prepare audio data
             audio_base64 = await self._prepare_audio_for_transcription(audio_file_path)
             
             # Send to ASR service and handle response
-            return await self._send_to_asr_service(audio_file_path.name, audio_base64)
+            return await self._send_to_asr_service(audio_file_path.name, audio_base64, asr_model)
             
         except Exception as e:
             logger.error(f"Error getting transcription: {str(e)}")
@@ -318,19 +536,20 @@ class ProjectService:
             audio_bytes = f.read()
             return base64.b64encode(audio_bytes).decode('utf-8')
 
-    async def _send_to_asr_service(self, filename: str, audio_base64: str) -> str:
-        """Send audio to ASR service and process response"""
-        response = requests.post(
-            f"{self.asr_service_url}/transcribe",
+    async def _send_to_asr_service(self, filename: str, audio_base64: str, asr_model: Optional[str] = None) -> Dict[str, Any]:
+        """Send audio to the least-loaded ASR replica for the model and process response"""
+        response = await self.asr_router.post(
+            "/transcribe",
             json={
                 "audio_bytes": audio_base64,
-                "filename": filename
+                "filename": filename,
+                "segments": self.split_segments
             },
+            model=asr_model,
             timeout=60  # One minute timeout
         )
         
         if response.status_code != 200:
             raise Exception(f"ASR service error: {response.text}")
         
-        transcription_result = response.json()
-        return transcription_result["transcription"] 
\ No newline at end of file
+        return response.json() 
\ No newline at end of file
@@ -0,0 +1,176 @@
+from typing import Dict, Any, Awaitable, Callable, Deque, Optional, TypeVar
+from collections import deque
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flow:
+    """Queue of pending work for one project"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.last_finish = 0.0
+        self.pending: Deque[asyncio.Future] = deque()
+
+
+class SchedulerService:
+    """Global scheduler for file-level work across projects and users.
+
+    Work is queued per project and dispatched with weighted start-time fair
+    queuing: a project's next file is tagged with a virtual start time, and the
+    eligible file with the smallest tag runs first. A project that arrives while
+    a bulk job is running starts at the current virtual time, so its files
+    interleave with the bulk job right away instead of waiting behind its
+    backlog. The scheduler is work-conserving: a lone bulk job still uses every
+    slot, up to the per-user and per-project caps.
+
+    Each user's share is their weight from `user_weights` (default 1), split
+    evenly across the user's active projects, so starting many projects does
+    not buy a user more capacity. Tags are assigned when a file reaches the
+    head of its project's queue, so shares follow projects coming and going.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_per_user: Optional[int] = None,
+        max_per_project: Optional[int] = None,
+        user_weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user or max_concurrency
+        self.max_per_project = max_per_project or max_concurrency
+        self.user_weights = user_weights or {}
+        if any(weight <= 0 for weight in self.user_weights.values()):
+            raise ValueError("Scheduler user weights must be positive")
+        self._virtual_time = 0.0
+        self._flows: Dict[str, _Flow] = {}
+        self._running_total = 0
+        self._running_by_user: Dict[str, int] = {}
+        self._running_by_project: Dict[str, int] = {}
+        logger.info(
+            f"Scheduler limits: total={self.max_concurrency}, "
+            f"per user={self.max_per_user}, per project={self.max_per_project}"
+        )
+
+    @classmethod
+    def from_env(cls) -> "SchedulerService":
+        """Build the scheduler from the SCHEDULER_* settings.
+
+        SCHEDULER_USER_WEIGHTS is a comma-separated list of `user_id=weight`
+        entries, e.g. `3f2c...=4,9a1b...=0.5`; unlisted users get weight 1.
+        """
+        user_weights = {}
+        for entry in os.getenv("SCHEDULER_USER_WEIGHTS", "").split(","):
+            if not entry.strip():
+                continue
+            user_id, _, weight = entry.strip().partition("=")
+            try:
+                user_weights[user_id.strip()] = float(weight)
+            except ValueError:
+                raise ValueError(f"Invalid SCHEDULER_USER_WEIGHTS entry: {entry}")
+
+        return cls(
+            max_concurrency=int(os.getenv("SCHEDULER_MAX_CONCURRENCY", os.cpu_count() or 1)),
+            max_per_user=int(os.getenv("SCHEDULER_MAX_PER_USER", 0)) or None,
+            max_per_project=int(os.getenv("SCHEDULER_MAX_PER_PROJECT", 0)) or None,
+            user_weights=user_weights
+        )
+
+    async def run(self, user_id: str, project_id: str, job: Callable[[], Awaitable[T]]) -> T:
+        """Wait for a fair-share slot, then run `job`"""
+        await self._acquire(user_id, project_id)
+        try:
+            return await job()
+        finally:
+            self._release(user_id, project_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current queue depth and running work, per project"""
+        return {
+            "running": self._running_total,
+            "projects": {
+                project_id: {
+                    "pending": len(flow.pending),
+                    "running": self._running_by_project.get(project_id, 0)
+                }
+                for project_id, flow in self._flows.items()
+            }
+        }
+
+    async def _acquire(self, user_id: str, project_id: str) -> None:
+        flow = self._flows.get(project_id)
+        if flow is None:
+            flow = self._flows[project_id] = _Flow(user_id)
+
+        granted = asyncio.get_running_loop().create_future()
+        flow.pending.append(granted)
+        self._dispatch()
+
+        try:
+            await granted
+        except asyncio.CancelledError:
+            if granted.done() and not granted.cancelled():
+                # Slot was granted just as we were cancelled; hand it back
+                self._release(user_id, project_id)
+            elif granted in flow.pending:
+                flow.pending.remove(granted)
+                self._remove_idle_flow(project_id)
+            raise
+
+    def _weight(self, user_id: str) -> float:
+        """A project's weight: its user's weight shared across the user's projects"""
+        projects = sum(1 for flow in self._flows.values() if flow.user_id == user_id)
+        return self.user_weights.get(user_id, 1.0) / max(projects, 1)
+
+    def _release(self, user_id: str, project_id: str) -> None:
+        self._running_total -= 1
+        self._running_by_user[user_id] -= 1
+        self._running_by_project[project_id] -= 1
+        self._remove_idle_flow(project_id)
+        self._dispatch()
+
+    def _remove_idle_flow(self, project_id: str) -> None:
+        flow = self._flows.get(project_id)
+        if flow is not None and not flow.pending and not self._running_by_project.get(project_id):
+            del self._flows[project_id]
+            self._running_by_project.pop(project_id, None)
+            if not self._running_by_user.get(flow.user_id):
+                self._running_by_user.pop(flow.user_id, None)
+
+    def _dispatch(self) -> None:
+        """Grant slots to the eligible queued work with the smallest start tags"""
+        while self._running_total < self.max_concurrency:
+            best_project_id = None
+            best_start = None
+            for project_id, flow in self._flows.items():
+                if not flow.pending:
+                    continue
+                if self._running_by_project.get(project_id, 0) >= self.max_per_project:
+                    continue
+                if self._running_by_user.get(flow.user_id, 0) >= self.max_per_user:
+                    continue
+                start = max(self._virtual_time, flow.last_finish)
+                if best_start is None or start < best_start:
+                    best_project_id, best_start = project_id, start
+
+            if best_project_id is None:
+                return
+
+            flow = self._flows[best_project_id]
+            granted = flow.pending.popleft()
+            if granted.cancelled():
+                # Waiter was cancelled before it could clean up after itself
+                self._remove_idle_flow(best_project_id)
+                continue
+            self._virtual_time = best_start
+            flow.last_finish = best_start + 1.0 / self._weight(flow.user_id)
+            self._running_total += 1
+            self._running_by_user[flow.user_id] = self._running_by_user.get(flow.user_id, 0) + 1
+            self._running_by_project[best_project_id] = self._running_by_project.get(best_project_id, 0) + 1
+            granted.set_result(None)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from service.fingerprint_service import compute_fingerprint, FingerprintIndex
+
+SAMPLE_RATE = 16000
+THRESHOLD = 0.75
+
+
+def synthetic_utterance(seed: int, duration: float = 4.0) -> np.ndarray:
+    """Speech-like signal: voiced syllables with formants, pitch movement and pauses"""
+    rng = np.random.default_rng(seed)
+    base_f0 = rng.uniform(100, 220)
+    vowels = rng.uniform([300, 900, 2200], [800, 1800, 3000], size=(6, 3))
+    audio = np.zeros(int(SAMPLE_RATE * duration))
+    position = 0.1
+    while position < duration - 0.4:
+        length = rng.uniform(0.12, 0.35)
+        times = np.arange(int(length * SAMPLE_RATE)) / SAMPLE_RATE
+        f0 = base_f0 * (1 + 0.15 * np.sin(2 * np.pi * rng.uniform(1, 4) * times))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        formants = vowels[rng.integers(len(vowels))]
+        syllable = sum(
+            (sum(np.exp(-((h * f0.mean() - f) / 120) ** 2) for f in formants) + 0.02) / np.sqrt(h) * np.sin(h * phase)
+            for h in range(1, 25)
+        )
+        start = int(position * SAMPLE_RATE)
+        audio[start:start + len(times)] += syllable * np.sin(np.pi * times / length) ** 2
+        position += length + (rng.uniform(0.15, 0.5) if rng.random() < 0.25 else rng.uniform(0.0, 0.05))
+    return (audio / np.abs(audio).max() * 0.5).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def original():
+    return synthetic_utterance(1)
+
+
+@pytest.fixture(scope="module")
+def index(original):
+    index = FingerprintIndex()
+    index.add("original", "project-1", compute_fingerprint(original, SAMPLE_RATE))
+    for seed in range(2, 6):
+        index.add(f"other-{seed}", "project-1", compute_fingerprint(synthetic_utterance(seed), SAMPLE_RATE))
+    return index
+
+
+@pytest.mark.parametrize("head_ms, tail_ms", [(300, 0), (0, 300), (237, 413), (100, 100)])
+def test_trimmed_copy_matches(index, original, head_ms, tail_ms):
+    head = int(head_ms / 1000 * SAMPLE_RATE)
+    tail = len(original) - int(tail_ms / 1000 * SAMPLE_RATE)
+    match = index.query(compute_fingerprint(original[head:tail], SAMPLE_RATE), THRESHOLD)
+    assert match is not None
+    assert match[0] == "original"
+
+
+def test_noisy_relevelled_copy_matches(index, original):
+    rng = np.random.default_rng(0)
+    noise = rng.standard_normal(len(original)).astype(np.float32) * np.sqrt(np.mean(original ** 2) / 100)
+    match = index.query(compute_fingerprint((original + noise) * 0.3, SAMPLE_RATE), THRESHOLD)
+    assert match is not None
+    assert match[0] == "original"
+
+
+def test_unrelated_clip_does_not_match(index):
+    assert index.query(compute_fingerprint(synthetic_utterance(100), SAMPLE_RATE), THRESHOLD) is None
+
+
+def test_query_is_scoped_to_project(index, original):
+    fingerprint = compute_fingerprint(original[4000:], SAMPLE_RATE)
+    assert index.query(fingerprint, THRESHOLD, "project-2") is None
+    assert index.query(fingerprint, THRESHOLD, "project-1")[0] == "original"
+
+
+def test_query_or_add_indexes_only_new_files(original):
+    index = FingerprintIndex()
+    fingerprint = compute_fingerprint(original, SAMPLE_RATE)
+    assert index.query_or_add("a", "project-1", fingerprint, THRESHOLD) is None
+    assert index.query_or_add("b", "project-1", compute_fingerprint(original[3000:], SAMPLE_RATE), THRESHOLD)[0] == "a"
+    assert len(index) == 1
+
+
+def test_index_grows_and_round_trips_through_records():
+    fingerprints = {f"file-{seed}": compute_fingerprint(synthetic_utterance(seed, 2.0), SAMPLE_RATE) for seed in range(40)}
+    index = FingerprintIndex.from_records([
+        {"id": file_id, "project_id": "project-1", "fingerprint": fingerprint.tobytes()}
+        for file_id, fingerprint in fingerprints.items()
+    ])
+    assert len(index) == 40
+    for file_id in ("file-0", "file-21", "file-39"):
+        assert index.query(fingerprints[file_id], THRESHOLD)[0] == file_id
@@ -0,0 +1,69 @@
+import asyncio
+from service.progress_service import ProgressService
+
+
+def collect(service: ProgressService, project_id: str, project: dict, during=None) -> list:
+    """Run a subscriber to completion, optionally driving the service once it is registered"""
+    async def get_project():
+        return project
+
+    async def run():
+        events = []
+
+        async def consume():
+            async for event in service.subscribe(project_id, get_project):
+                events.append(event)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        if during:
+            during()
+        await asyncio.wait_for(task, timeout=1)
+        return events
+
+    return asyncio.run(run())
+
+
+def test_idle_project_closes_after_snapshot():
+    events = collect(ProgressService(), "p1", {"status": "completed", "progress": 100})
+    assert events == [
+        {"type": "progress", "progress": 100},
+        {"type": "status", "status": "completed"},
+    ]
+
+
+def test_running_project_streams_until_closed():
+    service = ProgressService(min_interval=0)
+    service.start("p1")
+
+    def finish():
+        service.publish_progress("p1", 2, 2)
+        service.publish_status("p1", "completed")
+        service.close("p1")
+
+    events = collect(service, "p1", {"status": "in_progress", "progress": 40}, during=finish)
+    assert events[:2] == [
+        {"type": "progress", "progress": 40},
+        {"type": "status", "status": "in_progress"},
+    ]
+    assert events[2:] == [
+        {"type": "progress", "progress": 100, "processed": 2, "total": 2},
+        {"type": "status", "status": "completed"},
+    ]
+
+
+def test_late_joiner_gets_in_memory_progress():
+    service = ProgressService()
+    service.start("p1")
+    service.publish_progress("p1", 1, 4)
+    events = collect(service, "p1", {"status": "in_progress", "progress": 10}, during=lambda: service.close("p1"))
+    assert events[0] == {"type": "progress", "progress": 25, "processed": 1, "total": 4}
+
+
+def test_stale_in_progress_project_closes_without_a_run():
+    # Left in_progress by a backend that crashed; nothing here will close it
+    events = collect(ProgressService(), "p1", {"status": "in_progress", "progress": 30})
+    assert events == [
+        {"type": "progress", "progress": 30},
+        {"type": "status", "status": "in_progress"},
+    ]
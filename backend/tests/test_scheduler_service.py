@@ -0,0 +1,54 @@
+import asyncio
+from service.scheduler_service import SchedulerService
+
+
+def run_order(scheduler: SchedulerService, jobs: list, late_jobs: list = ()) -> list:
+    """Queue (user, project) jobs, optionally more after the first file ran, and return run order"""
+    order = []
+
+    async def job(user_id: str, project_id: str):
+        order.append(project_id)
+        await asyncio.sleep(0)
+
+    async def run():
+        tasks = [asyncio.create_task(scheduler.run(u, p, lambda u=u, p=p: job(u, p))) for u, p in jobs]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(scheduler.run(u, p, lambda u=u, p=p: job(u, p))) for u, p in late_jobs]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    return order
+
+
+def test_small_project_runs_ahead_of_bulk_job():
+    order = run_order(SchedulerService(1), [("a", "bulk")] * 50, [("b", "small")] * 3)
+    # Interleaved with the bulk job rather than queued behind its 50 files
+    assert max(i for i, project in enumerate(order) if project == "small") <= 6
+
+
+def test_user_weights_set_shares():
+    scheduler = SchedulerService(1, user_weights={"a": 3})
+    order = run_order(scheduler, [("a", "heavy")] * 40 + [("b", "light")] * 40)
+    assert order[:40].count("heavy") == 30
+
+
+def test_users_share_evenly_across_their_projects():
+    order = run_order(SchedulerService(1), [("a", "a1")] * 30 + [("a", "a2")] * 30 + [("b", "b1")] * 30)
+    first = order[:40]
+    assert abs(first.count("b1") - 20) <= 1
+    assert abs(first.count("a1") - first.count("a2")) <= 1
+
+
+def test_lone_project_uses_every_slot():
+    scheduler = SchedulerService(4)
+    running = []
+
+    async def job():
+        running.append(scheduler.get_stats()["running"])
+        await asyncio.sleep(0)
+
+    async def run():
+        await asyncio.gather(*(scheduler.run("a", "p", job) for _ in range(8)))
+
+    asyncio.run(run())
+    assert max(running) == 4
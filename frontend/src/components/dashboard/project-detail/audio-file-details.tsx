@@ -451,7 +451,8 @@ export function AudioFileDetails({
                   'bg-green-100 text-green-600': status === 'completed',
                   'bg-orange-100 text-orange-600': status === 'pending',
                   'bg-blue-100 text-blue-600': status === 'processing',
-                  'bg-red-100 text-red-600': status === 'failed'
+                  'bg-red-100 text-red-600': status === 'failed',
+                  'bg-gray-100 text-gray-600': status === 'skipped'
                 }
               )}>
                 {status.charAt(0).toUpperCase() + status.slice(1)}
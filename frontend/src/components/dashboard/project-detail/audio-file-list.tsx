@@ -120,7 +120,8 @@ export function AudioFileList({
                         'bg-green-100 text-green-600': file.transcription_status === 'completed',
                         'bg-orange-100 text-orange-600': file.transcription_status === 'pending',
                         'bg-blue-100 text-blue-600': file.transcription_status === 'processing',
-                        'bg-red-100 text-red-600': file.transcription_status === 'failed'
+                        'bg-red-100 text-red-600': file.transcription_status === 'failed',
+                        'bg-gray-100 text-gray-600': file.transcription_status === 'skipped'
                       }
                     )}
                   >
@@ -156,6 +157,8 @@ export function AudioFileList({
                             ? 'Processing in progress'
                             : file.transcription_status === 'failed'
                             ? 'Retry processing'
+                            : file.transcription_status === 'skipped'
+                            ? 'Skipped as a near-duplicate, process anyway'
                             : 'Process file'}
                         </TooltipContent>
                       </Tooltip>
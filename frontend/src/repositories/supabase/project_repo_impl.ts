@@ -66,34 +66,70 @@ export class SupabaseProjectRepositoryImpl implements IProjectRepository {
   }
 
   async addAudioFile(projectId: string, file: File, duration?: number): Promise<AudioFile> {
-    // 1. Upload file to storage
-    const fileExt = file.name.split('.').pop()
-    const filePath = `${projectId}/${Date.now()}-${file.name}`
-    
-    const { error: uploadError } = await this.supabase.storage
-      .from('audio-files')
-      .upload(filePath, file)
+    // Files go through the backend, which converts them to 16 kHz mono WAV and
+    // records their metadata, so only normalized audio reaches storage
+    const { data: { session } } = await this.supabase.auth.getSession();
 
-    if (uploadError) throw uploadError
+    if (!session?.access_token) {
+      throw new Error('No authentication token available');
+    }
 
-    // 2. Create database record
-    const { data: audioFile, error: dbError } = await this.supabase
-      .from('audio_files')
-      .insert({
-        project_id: projectId,
-        file_name: file.name,
-        file_path_raw: filePath,
-        file_size: file.size,
-        format: fileExt,
-        duration: duration,
-        transcription_status: 'pending',
-        created_by: (await this.supabase.auth.getUser()).data.user?.id,
-      })
-      .select()
-      .single()
+    const headers = { 'Authorization': `Bearer ${session.access_token}` };
+    const uploadUrl = 'http://localhost:8080/project/uploads';
+    const chunkSize = 8 * 1024 * 1024;
+    const maxRetries = 3;
+
+    // 1. Open the upload
+    const createResponse = await fetch(`http://localhost:8080/project/${projectId}/uploads`, {
+      method: 'POST',
+      headers: { ...headers, 'Content-Type': 'application/json' },
+      body: JSON.stringify({ file_name: file.name, file_size: file.size }),
+    });
+    if (!createResponse.ok) {
+      const error = await createResponse.json();
+      throw new Error(error.detail || 'Failed to start upload');
+    }
+    const { upload_id: uploadId } = await createResponse.json();
+
+    // 2. Send chunks, resuming from the server's offset after a failed request
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+      try {
+        const response = await fetch(`${uploadUrl}/${uploadId}`, {
+          method: 'PUT',
+          headers: { ...headers, 'Content-Type': 'application/octet-stream', 'Upload-Offset': String(offset) },
+          body: file.slice(offset, offset + chunkSize),
+        });
+        if (response.status === 409) {
+          offset = (await response.json()).detail.offset;
+          continue;
+        }
+        if (!response.ok) {
+          const error = await response.json();
+          throw new Error(error.detail || 'Failed to upload chunk');
+        }
+        offset = (await response.json()).offset;
+        retries = 0;
+      } catch (error) {
+        if (++retries > maxRetries) throw error;
+        const statusResponse = await fetch(`${uploadUrl}/${uploadId}`, { headers });
+        if (!statusResponse.ok) throw error;
+        offset = (await statusResponse.json()).offset;
+      }
+    }
+
+    // 3. Normalize and register the file
+    const completeResponse = await fetch(`${uploadUrl}/${uploadId}/complete`, {
+      method: 'POST',
+      headers,
+    });
+    if (!completeResponse.ok) {
+      const error = await completeResponse.json();
+      throw new Error(error.detail || 'Failed to process uploaded file');
+    }
 
-    if (dbError) throw dbError
-    return audioFile
+    return completeResponse.json()
   }
 
   async getProjectAudioFiles(projectId: string): Promise<AudioFile[]> {
@@ -300,10 +336,13 @@ export class SupabaseProjectRepositoryImpl implements IProjectRepository {
       // 2. Get all audio files for the project
       const audioFiles = await this.getProjectAudioFiles(projectId);
       
-      // 3. Filter audio files based on includeProcessed option
+      // 3. Filter audio files based on includeProcessed option,
+      // exporting segments in place of files that were split into them
+      const splitParentIds = new Set(audioFiles.map(file => file.parent_id).filter(Boolean));
+      const exportableFiles = audioFiles.filter(file => !splitParentIds.has(file.id));
       const filesToExport = includeProcessed 
-        ? audioFiles.filter(file => file.transcription_status === 'completed')
-        : audioFiles;
+        ? exportableFiles.filter(file => file.transcription_status === 'completed')
+        : exportableFiles;
       
       if (filesToExport.length === 0) {
         throw new Error('No files to export. Ensure files have completed transcriptions.');
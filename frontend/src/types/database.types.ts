@@ -1,5 +1,5 @@
 export type ProjectStatus = 'draft' | 'in_progress' | 'completed' | 'archived'
-export type ProcessingStatus = 'pending' | 'processing' | 'completed' | 'failed'
+export type ProcessingStatus = 'pending' | 'processing' | 'completed' | 'failed' | 'skipped'
 
 export interface Project {
   id: string
@@ -11,6 +11,7 @@ export interface Project {
   total_size: number
   total_duration: number
   dataset_path: string | null
+  asr_model: string | null
   created_at: string
   updated_at: string
   created_by: string
@@ -27,10 +28,18 @@ export interface AudioFile {
   channels: number | null
   bit_depth: number | null
   format: string | null
+  source_format: string | null
+  source_sample_rate: number | null
+  source_channels: number | null
+  source_bit_depth: number | null
   transcription_status: ProcessingStatus
   transcription_content: string | null
   confidence: number | null
   error_message: string | null
+  duplicate_of: string | null
+  parent_id: string | null
+  segment_start: number | null
+  segment_end: number | null
   processing_started_at: string | null
   processing_completed_at: string | null
   created_at: string
@@ -0,0 +1,2 @@
+-- ASR model used to transcribe a project's files (null = backend default)
+alter table projects add column if not exists asr_model text;
@@ -0,0 +1,8 @@
+-- Spectral fingerprint used for near-duplicate detection: base64 of one
+-- little-endian uint16 sub-fingerprint per 10 ms frame
+alter table audio_files add column if not exists fingerprint text;
+
+-- Earlier file this one is a near-duplicate of, if any
+alter table audio_files add column if not exists duplicate_of uuid references audio_files(id) on delete set null;
+
+create index if not exists audio_files_duplicate_of on audio_files (duplicate_of);
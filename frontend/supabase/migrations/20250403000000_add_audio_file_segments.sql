@@ -0,0 +1,6 @@
+-- Segments cut from a longer file at forced-alignment boundaries
+alter table audio_files add column if not exists parent_id uuid references audio_files(id) on delete cascade;
+alter table audio_files add column if not exists segment_start float; -- seconds into the parent file
+alter table audio_files add column if not exists segment_end float;
+
+create index if not exists audio_files_parent_id on audio_files (parent_id);
@@ -0,0 +1,2 @@
+-- Files deliberately skipped (e.g. near-duplicates) instead of processed
+alter type processing_status add value if not exists 'skipped';
@@ -0,0 +1,5 @@
+-- Properties of the file as uploaded, before it was normalized to 16 kHz mono WAV
+alter table audio_files add column if not exists source_format text;
+alter table audio_files add column if not exists source_sample_rate integer;
+alter table audio_files add column if not exists source_channels integer;
+alter table audio_files add column if not exists source_bit_depth integer;
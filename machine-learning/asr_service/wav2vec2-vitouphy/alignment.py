@@ -0,0 +1,114 @@
+"""CTC forced alignment over the logits the service already computes.
+
+Aligns a transcript's token ids to the frames with a Viterbi pass that is
+vectorized across CTC states, then groups tokens into word timings and words
+into training-sized segments split at pauses.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+NEG_INF = -1e30
+
+
+def ctc_forced_align(log_probs: np.ndarray, targets: List[int], blank_id: int) -> Optional[List[Dict]]:
+    """Best CTC alignment of `targets` to `log_probs` of shape (frames, vocab).
+
+    Returns one entry per target token with its start/end frame (end exclusive)
+    and mean frame posterior, or None when the transcript cannot fit in the
+    available frames.
+    """
+    num_frames = log_probs.shape[0]
+    if not targets:
+        return []
+
+    # Extended label sequence: blank, y1, blank, y2, ..., yN, blank
+    states = np.full(2 * len(targets) + 1, blank_id, dtype=np.int64)
+    states[1::2] = targets
+    num_states = len(states)
+
+    # Skipping the blank between two labels is only allowed when they differ
+    can_skip = np.zeros(num_states, dtype=bool)
+    can_skip[3::2] = states[3::2] != states[1:-2:2]
+
+    emissions = log_probs[:, states]
+    scores = np.full(num_states, NEG_INF)
+    scores[:2] = emissions[0, :2]
+    backpointers = np.zeros((num_frames, num_states), dtype=np.int8)
+
+    for t in range(1, num_frames):
+        stay = scores
+        step = np.concatenate(([NEG_INF], scores[:-1]))
+        skip = np.where(can_skip, np.concatenate(([NEG_INF, NEG_INF], scores[:-2])), NEG_INF)
+        candidates = np.stack([stay, step, skip])
+        best = candidates.argmax(axis=0)
+        backpointers[t] = best
+        scores = candidates[best, np.arange(num_states)] + emissions[t]
+
+    # A valid path ends on the last label or the trailing blank
+    end_state = num_states - 1 if scores[-1] >= scores[-2] else num_states - 2
+    if scores[end_state] <= NEG_INF / 2:
+        return None
+
+    path = np.empty(num_frames, dtype=np.int64)
+    state = end_state
+    for t in range(num_frames - 1, -1, -1):
+        path[t] = state
+        state -= backpointers[t, state]
+
+    frame_scores = emissions[np.arange(num_frames), path]
+    tokens = []
+    for index in range(len(targets)):
+        frames = np.flatnonzero(path == 2 * index + 1)
+        tokens.append({
+            "token_id": int(targets[index]),
+            "start": int(frames[0]),
+            "end": int(frames[-1]) + 1,
+            "confidence": float(np.exp(frame_scores[frames].mean()))
+        })
+    return tokens
+
+
+def group_words(tokens: List[Dict], vocabulary: List[str], word_delimiter: str, frame_duration: float) -> List[Dict]:
+    """Merge aligned tokens into words with start/end times in seconds"""
+    words = []
+    current: List[Dict] = []
+    for token in tokens + [None]:
+        if token is not None and vocabulary[token["token_id"]] != word_delimiter:
+            current.append(token)
+            continue
+        if current:
+            words.append({
+                "text": "".join(vocabulary[t["token_id"]] for t in current),
+                "start": round(current[0]["start"] * frame_duration, 3),
+                "end": round(current[-1]["end"] * frame_duration, 3),
+                "confidence": float(np.mean([t["confidence"] for t in current]))
+            })
+            current = []
+    return words
+
+
+def split_segments(words: List[Dict], max_pause: float, max_duration: float) -> List[Dict]:
+    """Group words into segments, breaking at pauses longer than `max_pause`
+    or before a segment would exceed `max_duration` seconds"""
+    segments = []
+    current: List[Dict] = []
+    for word in words:
+        if current and (
+            word["start"] - current[-1]["end"] > max_pause
+            or word["end"] - current[0]["start"] > max_duration
+        ):
+            segments.append(current)
+            current = []
+        current.append(word)
+    if current:
+        segments.append(current)
+
+    return [
+        {
+            "start": segment[0]["start"],
+            "end": segment[-1]["end"],
+            "text": " ".join(word["text"] for word in segment),
+            "confidence": float(np.mean([word["confidence"] for word in segment]))
+        }
+        for segment in segments
+    ]
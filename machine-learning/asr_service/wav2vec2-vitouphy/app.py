@@ -2,6 +2,7 @@ from fastapi import FastAPI, File, UploadFile, HTTPException, Body
 import os
 from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
 import torch
+import numpy as np
 import io
 import soundfile as sf
 from pydantic import BaseModel
@@ -9,11 +10,17 @@ from typing import Optional, Union
 from fastapi.responses import JSONResponse
 import logging
 from fastapi.middleware.cors import CORSMiddleware
+from decoding import ctc_greedy_confidences, BeamSearchDecoder, Lexicon, NGramLanguageModel
+from alignment import ctc_forced_align, group_words, split_segments
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Limit intra-op threads, e.g. when running several workers on one host
+if os.getenv("TORCH_NUM_THREADS"):
+    torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS")))
+
 app = FastAPI()
 
 # Add CORS middleware to allow requests from backend
@@ -28,6 +35,8 @@ app.add_middleware(
 class AudioData(BaseModel):
     audio_bytes: str  # base64 encoded audio data
     filename: str
+    decoder: Optional[str] = None  # "greedy" or "beam"; defaults to beam when a lexicon/LM is configured
+    segments: bool = False  # Also return word timings and pause-split segments
 
 # Model Path
 MODEL_ID = "vithouphy/wav2vec2-xlc-r-300m-khmer"
@@ -52,7 +61,51 @@ except:
     model.save_pretrained(MODEL_PATH)
     print("Model downloaded and saved locally")
 
-async def process_audio(audio_bytes: bytes, filename: str):
+# Optional lexicon + n-gram LM beam search decoding
+LEXICON_PATH = os.getenv("LEXICON_PATH")
+LM_PATH = os.getenv("LM_PATH")
+vocabulary = processor.tokenizer.convert_ids_to_tokens(list(range(len(processor.tokenizer))))
+blank_id = processor.tokenizer.pad_token_id
+beam_decoder = None
+if LEXICON_PATH or LM_PATH:
+    beam_decoder = BeamSearchDecoder(
+        vocabulary,
+        blank_id,
+        word_delimiter=processor.tokenizer.word_delimiter_token,
+        lexicon=Lexicon.from_file(LEXICON_PATH) if LEXICON_PATH else None,
+        language_model=NGramLanguageModel.from_arpa(LM_PATH) if LM_PATH else None,
+        beam_width=int(os.getenv("BEAM_WIDTH", "16")),
+        alpha=float(os.getenv("LM_ALPHA", "0.5")),
+        beta=float(os.getenv("LM_BETA", "1.0"))
+    )
+    print("Beam search decoder enabled")
+
+# Forced alignment / segmentation settings
+FRAME_DURATION = model.config.inputs_to_logits_ratio / processor.feature_extractor.sampling_rate
+SEGMENT_MAX_PAUSE = float(os.getenv("SEGMENT_MAX_PAUSE", "0.4"))  # seconds of silence that end a segment
+SEGMENT_MAX_DURATION = float(os.getenv("SEGMENT_MAX_DURATION", "15"))  # longest segment in seconds
+
+def force_align(logits: torch.Tensor, transcription: str):
+    """Aligned tokens of a transcript via CTC forced alignment, or None if it doesn't fit"""
+    targets = processor.tokenizer(transcription).input_ids
+    log_probs = torch.log_softmax(logits[0].float(), dim=-1).numpy()
+    tokens = ctc_forced_align(log_probs, targets, blank_id)
+    if tokens is None:
+        logger.warning("Transcript could not be aligned to the audio")
+    return tokens
+
+def align_segments(tokens):
+    """Word timings and pause-split segments from aligned tokens"""
+    if tokens is None:
+        return {"words": [], "segments": []}
+
+    words = group_words(tokens, vocabulary, processor.tokenizer.word_delimiter_token, FRAME_DURATION)
+    return {
+        "words": words,
+        "segments": split_segments(words, SEGMENT_MAX_PAUSE, SEGMENT_MAX_DURATION)
+    }
+
+async def process_audio(audio_bytes: bytes, filename: str, decoder: Optional[str] = None, segments: bool = False):
     """Common processing function for both routes"""
     if not filename.endswith('.wav'):
         raise HTTPException(status_code=400, detail="Only WAV files are supported")
@@ -76,16 +129,53 @@ async def process_audio(audio_bytes: bytes, filename: str):
             raise HTTPException(status_code=500, detail="Failed to process audio with the model processor")
         
         # Get prediction
+        use_beam = decoder == "beam" or (decoder is None and beam_decoder is not None)
+        if use_beam and beam_decoder is None:
+            raise HTTPException(status_code=400, detail="Beam search decoding requires LEXICON_PATH or LM_PATH")
+
         try:
-            logits = model(input_values).logits
-            predicted_ids = torch.argmax(logits, dim=-1)
-            transcription = processor.decode(predicted_ids[0])
-            
-            return {
+            with torch.inference_mode():
+                logits = model(input_values).logits
+
+            aligned = None
+            if use_beam:
+                # The beam transcript can differ from the greedy path, so score
+                # the tokens it actually emitted by aligning them to the frames
+                transcription = beam_decoder.decode_batch(logits)[0]
+                aligned = force_align(logits, transcription)
+                if aligned:
+                    token_ids = [token["token_id"] for token in aligned]
+                    token_confidences = [token["confidence"] for token in aligned]
+                    confidence = float(np.mean(token_confidences))
+                elif aligned is not None:
+                    # Nothing emitted; fall back to the greedy blank posterior
+                    token_ids, token_confidences = [], []
+                    confidence = ctc_greedy_confidences(logits, blank_id)[0]["confidence"]
+                else:
+                    token_ids, token_confidences, confidence = [], [], None
+            else:
+                predicted_ids = torch.argmax(logits, dim=-1)
+                transcription = processor.decode(predicted_ids[0])
+                greedy = ctc_greedy_confidences(logits, blank_id)[0]
+                token_ids, token_confidences, confidence = greedy["token_ids"], greedy["token_confidences"], greedy["confidence"]
+
+            result = {
                 "transcription": transcription,
+                "confidence": confidence,
+                "tokens": [
+                    {"token": vocabulary[token_id], "confidence": token_confidence}
+                    for token_id, token_confidence in zip(token_ids, token_confidences)
+                ],
+                "decoder": "beam" if use_beam else "greedy",
                 "filename": filename,
                 "status": "success"
             }
+            if segments:
+                # Reuses the same forward pass instead of running a separate aligner
+                if aligned is None and not use_beam:
+                    aligned = force_align(logits, transcription)
+                result.update(align_segments(aligned))
+            return result
         except Exception as e:
             raise HTTPException(status_code=500, detail="Failed to generate transcription")
             
@@ -113,7 +203,7 @@ async def transcribe_bytes(audio_data: AudioData):
         audio_bytes = base64.b64decode(audio_data.audio_bytes)
         logger.info(f"Decoded to {len(audio_bytes)} bytes")
         
-        result = await process_audio(audio_bytes, audio_data.filename)
+        result = await process_audio(audio_bytes, audio_data.filename, audio_data.decoder, audio_data.segments)
         logger.info(f"Processing complete: {result}")
         return result
     except Exception as e:
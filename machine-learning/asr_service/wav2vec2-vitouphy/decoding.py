@@ -0,0 +1,274 @@
+"""CTC decoding helpers for the wav2vec2 service.
+
+Provides vectorized greedy confidences computed straight from the logits and an
+optional prefix beam search constrained by a word lexicon and scored with an
+ARPA n-gram language model.
+"""
+from typing import Dict, List, Optional, Tuple
+import math
+import logging
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+LOG10_TO_LN = math.log(10)
+NEG_INF = -float("inf")
+
+
+def ctc_greedy_confidences(logits: torch.Tensor, blank_id: int, lengths: Optional[torch.Tensor] = None) -> List[Dict]:
+    """Greedy CTC path with per-token and per-utterance confidences.
+
+    `logits` has shape (batch, frames, vocab). A token's confidence is the
+    geometric mean of its frame posteriors along the collapsed greedy path; the
+    utterance confidence is the mean of its token confidences (or the mean blank
+    posterior when nothing was emitted).
+    """
+    log_probs = torch.log_softmax(logits.float(), dim=-1)
+    best_log_probs, best_ids = log_probs.max(dim=-1)
+    batch_size, num_frames = best_ids.shape
+
+    if lengths is None:
+        lengths = torch.full((batch_size,), num_frames, dtype=torch.long)
+    valid = torch.arange(num_frames).unsqueeze(0) < lengths.unsqueeze(1)
+
+    # Number consecutive runs of the same id so each run collapses to one token
+    previous_ids = torch.nn.functional.pad(best_ids[:, :-1], (1, 0), value=-1)
+    run_starts = (best_ids != previous_ids) & valid
+    run_index = torch.cumsum(run_starts.long(), dim=1) - 1
+    flat_index = (run_index + torch.arange(batch_size).unsqueeze(1) * num_frames).clamp(min=0)
+
+    masked_log_probs = torch.where(valid, best_log_probs, torch.zeros_like(best_log_probs))
+    run_log_prob_sum = torch.zeros(batch_size * num_frames).scatter_add_(0, flat_index.flatten(), masked_log_probs.flatten())
+    run_length = torch.zeros(batch_size * num_frames).scatter_add_(0, flat_index.flatten(), valid.float().flatten())
+    run_confidence = torch.exp(run_log_prob_sum / run_length.clamp(min=1)).view(batch_size, num_frames)
+
+    token_mask = run_starts & (best_ids != blank_id)
+    frame_confidence = torch.where(valid, best_log_probs.exp(), torch.zeros_like(best_log_probs)).sum(dim=1) / lengths.clamp(min=1)
+
+    results = []
+    for b in range(batch_size):
+        token_ids = best_ids[b][token_mask[b]].tolist()
+        token_confidences = run_confidence[b][run_index[b][token_mask[b]]].tolist()
+        confidence = float(np.mean(token_confidences)) if token_confidences else float(frame_confidence[b])
+        results.append({
+            "token_ids": token_ids,
+            "token_confidences": token_confidences,
+            "confidence": confidence
+        })
+    return results
+
+
+class Lexicon:
+    """Set of valid words plus every word prefix, for constraining beam search"""
+
+    def __init__(self, words: List[str]):
+        self.words = set(words)
+        self.prefixes = {word[:i] for word in self.words for i in range(1, len(word) + 1)}
+
+    @classmethod
+    def from_file(cls, path: str) -> "Lexicon":
+        with open(path, encoding="utf-8") as f:
+            words = [line.split()[0] for line in f if line.strip()]
+        logger.info(f"Loaded lexicon with {len(words)} words from {path}")
+        return cls(words)
+
+
+class NGramLanguageModel:
+    """Backoff n-gram language model loaded from an ARPA file"""
+
+    def __init__(self, ngrams: Dict[Tuple[str, ...], Tuple[float, float]], order: int):
+        self.ngrams = ngrams
+        self.order = order
+        self.unk_log_prob = ngrams.get(("<unk>",), (-10.0, 0.0))[0] * LOG10_TO_LN
+
+    @classmethod
+    def from_arpa(cls, path: str) -> "NGramLanguageModel":
+        ngrams = {}
+        order = 0
+        current_order = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("ngram ") or line == "\\data\\":
+                    continue
+                if line.startswith("\\") and line.endswith("-grams:"):
+                    current_order = int(line[1:line.index("-")])
+                    order = max(order, current_order)
+                    continue
+                if line == "\\end\\":
+                    break
+                parts = line.split("\t") if "\t" in line else line.split()
+                if current_order == 0 or len(parts) < 2:
+                    continue
+                log_prob = float(parts[0])
+                if "\t" in line:
+                    words = tuple(parts[1].split())
+                    backoff = float(parts[2]) if len(parts) > 2 else 0.0
+                else:
+                    words = tuple(parts[1:1 + current_order])
+                    backoff = float(parts[1 + current_order]) if len(parts) > 1 + current_order else 0.0
+                ngrams[words] = (log_prob, backoff)
+        logger.info(f"Loaded {order}-gram language model with {len(ngrams)} entries from {path}")
+        return cls(ngrams, order)
+
+    def score(self, context: Tuple[str, ...], word: str) -> float:
+        """Natural-log probability of `word` following `context`"""
+        context = context[-(self.order - 1):] if self.order > 1 else ()
+        backoff = 0.0
+        while True:
+            entry = self.ngrams.get(context + (word,))
+            if entry is not None:
+                return (entry[0] + backoff) * LOG10_TO_LN
+            if not context:
+                return self.unk_log_prob + backoff * LOG10_TO_LN
+            backoff += self.ngrams.get(context, (0.0, 0.0))[1]
+            context = context[1:]
+
+
+class _Beam:
+    __slots__ = ("p_blank", "p_non_blank", "lm_score", "words", "partial")
+
+    def __init__(self, lm_score: float = 0.0, words: Tuple[str, ...] = (), partial: str = ""):
+        self.p_blank = NEG_INF
+        self.p_non_blank = NEG_INF
+        self.lm_score = lm_score
+        self.words = words
+        self.partial = partial
+
+    @property
+    def acoustic(self) -> float:
+        return np.logaddexp(self.p_blank, self.p_non_blank)
+
+
+class BeamSearchDecoder:
+    """CTC prefix beam search with an optional lexicon and n-gram LM.
+
+    The per-frame candidate pruning runs as one tensor op over the whole batch;
+    the prefix search itself then walks each utterance over those candidates.
+    """
+
+    def __init__(
+        self,
+        vocabulary: List[str],
+        blank_id: int,
+        word_delimiter: str = "|",
+        lexicon: Optional[Lexicon] = None,
+        language_model: Optional[NGramLanguageModel] = None,
+        beam_width: int = 16,
+        alpha: float = 0.5,
+        beta: float = 1.0,
+        prune_top_k: int = 8,
+        prune_log_prob: float = -10.0
+    ):
+        self.vocabulary = vocabulary
+        self.blank_id = blank_id
+        self.word_delimiter = word_delimiter
+        self.lexicon = lexicon
+        self.language_model = language_model
+        self.beam_width = beam_width
+        self.alpha = alpha
+        self.beta = beta
+        self.prune_top_k = min(prune_top_k, len(vocabulary))
+        self.prune_log_prob = prune_log_prob
+
+    def decode_batch(self, logits: torch.Tensor, lengths: Optional[torch.Tensor] = None) -> List[str]:
+        """Decode a batch of logits of shape (batch, frames, vocab) into transcripts"""
+        log_probs = torch.log_softmax(logits.float(), dim=-1)
+        top_log_probs, top_ids = log_probs.topk(self.prune_top_k, dim=-1)
+        top_log_probs = top_log_probs.numpy()
+        top_ids = top_ids.numpy()
+
+        batch_size, num_frames = top_ids.shape[:2]
+        if lengths is None:
+            lengths = [num_frames] * batch_size
+        return [
+            self._decode(top_ids[b, :int(lengths[b])], top_log_probs[b, :int(lengths[b])])
+            for b in range(batch_size)
+        ]
+
+    def _word_score(self, beam: _Beam, word: str) -> Optional[float]:
+        """LM score for completing `word`, or None if the lexicon rejects it"""
+        if self.lexicon is not None and word not in self.lexicon.words:
+            return None
+        if self.language_model is None:
+            return 0.0
+        return self.language_model.score(beam.words, word)
+
+    def _total_score(self, prefix: Tuple[int, ...], beam: _Beam) -> float:
+        return beam.acoustic + self.alpha * beam.lm_score + self.beta * len(beam.words)
+
+    def _extend(self, beams: Dict, prefix: Tuple[int, ...], beam: _Beam, token_id: int) -> Optional[_Beam]:
+        """Get or create the beam for `prefix + token_id`, applying lexicon and LM"""
+        new_prefix = prefix + (token_id,)
+        if new_prefix in beams:
+            return beams[new_prefix]
+
+        token = self.vocabulary[token_id]
+        if token == self.word_delimiter:
+            if not beam.partial:
+                new_beam = _Beam(beam.lm_score, beam.words, "")
+            else:
+                word_score = self._word_score(beam, beam.partial)
+                if word_score is None:
+                    return None
+                new_beam = _Beam(beam.lm_score + word_score, beam.words + (beam.partial,), "")
+        else:
+            partial = beam.partial + token
+            if self.lexicon is not None and partial not in self.lexicon.prefixes:
+                return None
+            new_beam = _Beam(beam.lm_score, beam.words, partial)
+
+        beams[new_prefix] = new_beam
+        return new_beam
+
+    def _decode(self, top_ids: np.ndarray, top_log_probs: np.ndarray) -> str:
+        root = _Beam()
+        root.p_blank = 0.0
+        beams: Dict[Tuple[int, ...], _Beam] = {(): root}
+
+        for frame_ids, frame_log_probs in zip(top_ids, top_log_probs):
+            next_beams: Dict[Tuple[int, ...], _Beam] = {}
+            for prefix, beam in beams.items():
+                same = next_beams.get(prefix)
+                if same is None:
+                    same = next_beams[prefix] = _Beam(beam.lm_score, beam.words, beam.partial)
+                for token_id, log_prob in zip(frame_ids.tolist(), frame_log_probs.tolist()):
+                    if log_prob < self.prune_log_prob:
+                        break
+                    if token_id == self.blank_id:
+                        same.p_blank = np.logaddexp(same.p_blank, beam.acoustic + log_prob)
+                        continue
+                    if prefix and prefix[-1] == token_id:
+                        # Repeated token without a blank in between collapses into the same prefix
+                        same.p_non_blank = np.logaddexp(same.p_non_blank, beam.p_non_blank + log_prob)
+                        extended = self._extend(next_beams, prefix, beam, token_id)
+                        if extended is not None:
+                            extended.p_non_blank = np.logaddexp(extended.p_non_blank, beam.p_blank + log_prob)
+                    else:
+                        extended = self._extend(next_beams, prefix, beam, token_id)
+                        if extended is not None:
+                            extended.p_non_blank = np.logaddexp(extended.p_non_blank, beam.acoustic + log_prob)
+
+            ranked = sorted(next_beams.items(), key=lambda item: self._total_score(*item), reverse=True)
+            beams = dict(ranked[:self.beam_width])
+
+        # Score the trailing partial word before picking the winner
+        best_prefix, best_score = None, NEG_INF
+        for prefix, beam in beams.items():
+            score = self._total_score(prefix, beam)
+            if beam.partial:
+                word_score = self._word_score(beam, beam.partial)
+                if word_score is None:
+                    continue
+                score += self.alpha * word_score + self.beta
+            if score > best_score:
+                best_prefix, best_score = prefix, score
+
+        if best_prefix is None:
+            # Every beam ends mid-word (a clip cut inside a word, or an OOV final
+            # word); keep the best one with its trailing partial left unscored
+            best_prefix = max(beams.items(), key=lambda item: self._total_score(*item))[0]
+
+        text = "".join(self.vocabulary[token_id] for token_id in best_prefix)
+        return " ".join(text.replace(self.word_delimiter, " ").split())
@@ -17,6 +17,10 @@ from transformers import AutoProcessor, AutoModelForSpeechSeq2Seq
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Limit intra-op threads, e.g. when running several workers on one host
+if os.getenv("TORCH_NUM_THREADS"):
+    torch.set_num_threads(int(os.getenv("TORCH_NUM_THREADS")))
+
 app = FastAPI()
 
 # Add CORS middleware to allow requests from backend
@@ -0,0 +1,350 @@
+"""Load generator for the ASR HTTP services.
+
+Replays a mix of clip durations against `/transcribe` at fixed request rates
+(open loop) or fixed concurrency levels (closed loop) and reports latency
+percentiles, throughput, error rate and server RSS for each load level.
+With `--sweep` it launches the service once per combination of tuning knobs
+and measures a capacity curve for each.
+
+Examples:
+    # Closed loop at 1, 4 and 8 concurrent clients against a running service
+    python load_test.py --url http://localhost:8000 --concurrency 1,4,8 --container asr-service
+
+    # Open loop at fixed request rates with a 2s/5s/15s clip mix
+    python load_test.py --url http://localhost:8000 --rates 0.5,1,2 --clip-mix 2:0.5,5:0.3,15:0.2
+
+    # Launch the service for every knob combination and write the curves to JSON
+    python load_test.py --service-dir ../asr_service/wav2vec2-vitouphy \\
+        --sweep workers=1,2 TORCH_NUM_THREADS=1,2,4 --concurrency 1,4,8 --output capacity.json
+
+`--sweep` runs the service itself, so the interpreter given by `--service-python`
+(this one by default) needs the service's requirements, including torch and
+transformers.
+"""
+import argparse
+import asyncio
+import base64
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+import aiohttp
+import numpy as np
+import soundfile as sf
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+def synthesize_clip(duration: float, seed: int) -> bytes:
+    """Speech-like test clip: band-limited noise with a ~4 Hz syllable envelope"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    noise = np.convolve(rng.standard_normal(len(t)), np.hanning(16), mode="same")
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t + rng.uniform(0, 2 * np.pi)))
+    audio = 0.3 * noise / np.abs(noise).max() * envelope
+    buffer = io.BytesIO()
+    sf.write(buffer, audio.astype(np.float32), SAMPLE_RATE, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def load_clips(clip_mix: str, clips_dir: Optional[Path]) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """Pre-encode clips and their sampling weights"""
+    if clips_dir:
+        paths = sorted(clips_dir.glob("*.wav"))
+        if not paths:
+            raise ValueError(f"No .wav files found in {clips_dir}")
+        clips = [
+            {"filename": path.name, "audio_bytes": base64.b64encode(path.read_bytes()).decode("utf-8"), "duration": sf.info(path).duration}
+            for path in paths
+        ]
+        return clips, [1.0] * len(clips)
+
+    clips, weights = [], []
+    for index, entry in enumerate(clip_mix.split(",")):
+        duration, _, weight = entry.partition(":")
+        clips.append({
+            "filename": f"clip_{duration}s.wav",
+            "audio_bytes": base64.b64encode(synthesize_clip(float(duration), index)).decode("utf-8"),
+            "duration": float(duration)
+        })
+        weights.append(float(weight or 1))
+    return clips, weights
+
+
+def process_tree_rss(pid: int) -> int:
+    """Resident memory in bytes of a process and all its descendants (Linux)"""
+    children: Dict[int, List[int]] = {}
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat_path.read_text().rsplit(")", 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(stat_path.parent.name))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+            total += next(int(line.split()[1]) * 1024 for line in status.splitlines() if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+def container_rss(container: str) -> int:
+    """Memory usage in bytes of a Docker container"""
+    output = subprocess.run(
+        ["docker", "stats", "--no-stream", "--format", "{{.MemUsage}}", container],
+        capture_output=True, text=True, check=True
+    ).stdout.split("/")[0].strip()
+    units = {"B": 1, "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3}
+    for unit in sorted(units, key=len, reverse=True):
+        if output.endswith(unit):
+            return int(float(output[:-len(unit)]) * units[unit])
+    return 0
+
+
+async def sample_rss(read_rss: Callable[[], int], samples: List[int], interval: float = 0.5) -> None:
+    while True:
+        try:
+            samples.append(await asyncio.to_thread(read_rss))
+        except Exception as e:
+            logger.warning(f"Could not read server RSS: {str(e)}")
+            return
+        await asyncio.sleep(interval)
+
+
+class LoadRun:
+    """Sends requests and records their outcomes for one load level"""
+
+    def __init__(self, url: str, clips: List[Dict[str, Any]], weights: List[float], timeout: float):
+        self.url = f"{url.rstrip('/')}/transcribe"
+        self.clips = clips
+        self.weights = weights
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.audio_seconds = 0.0
+        self.last_completion = 0.0
+
+    async def send(self, session: aiohttp.ClientSession) -> None:
+        clip = random.choices(self.clips, self.weights)[0]
+        started = time.perf_counter()
+        try:
+            async with session.post(self.url, json={"audio_bytes": clip["audio_bytes"], "filename": clip["filename"]}) as response:
+                await response.read()
+                ok = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        finished = time.perf_counter()
+
+        self.last_completion = max(self.last_completion, finished)
+        if ok:
+            self.latencies.append(finished - started)
+            self.audio_seconds += clip["duration"]
+        else:
+            self.errors += 1
+
+    async def closed_loop(self, concurrency: int, duration: float) -> float:
+        """`concurrency` clients each send back-to-back requests for `duration` seconds"""
+        async with aiohttp.ClientSession(timeout=self.timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+            started = time.perf_counter()
+            deadline = started + duration
+
+            async def client() -> None:
+                while time.perf_counter() < deadline:
+                    await self.send(session)
+
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+            return started
+
+    async def open_loop(self, rate: float, duration: float, poisson: bool) -> float:
+        """Start requests at `rate` per second for `duration` seconds regardless of responses"""
+        async with aiohttp.ClientSession(timeout=self.timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+            started = time.perf_counter()
+            next_arrival = started
+            tasks = []
+            while next_arrival < started + duration:
+                await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+                tasks.append(asyncio.create_task(self.send(session)))
+                next_arrival += random.expovariate(rate) if poisson else 1 / rate
+            await asyncio.gather(*tasks)
+            return started
+
+    def summary(self, started: float) -> Dict[str, Any]:
+        total = len(self.latencies) + self.errors
+        elapsed = max(self.last_completion - started, 1e-9)
+        percentiles = np.percentile(self.latencies, [50, 95, 99]) if self.latencies else [float("nan")] * 3
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": self.errors / total if total else 0.0,
+            "throughput_rps": len(self.latencies) / elapsed,
+            "audio_seconds_per_second": self.audio_seconds / elapsed,
+            "latency_p50": float(percentiles[0]),
+            "latency_p95": float(percentiles[1]),
+            "latency_p99": float(percentiles[2])
+        }
+
+
+async def run_levels(args: argparse.Namespace, url: str, clips: List[Dict[str, Any]], weights: List[float], read_rss: Optional[Callable[[], int]]) -> List[Dict[str, Any]]:
+    """Measure every requested load level against a running service"""
+    # Warm up so model initialization doesn't land in the first measurement
+    warmup = LoadRun(url, clips, weights, args.timeout)
+    async with aiohttp.ClientSession(timeout=warmup.timeout) as session:
+        for _ in range(args.warmup_requests):
+            await warmup.send(session)
+
+    levels = [("concurrency", level) for level in args.concurrency or []]
+    levels += [("rate", level) for level in args.rates or []]
+
+    results = []
+    for mode, level in levels:
+        run = LoadRun(url, clips, weights, args.timeout)
+        rss_samples: List[int] = []
+        sampler = asyncio.create_task(sample_rss(read_rss, rss_samples)) if read_rss else None
+        if mode == "concurrency":
+            started = await run.closed_loop(level, args.duration)
+        else:
+            started = await run.open_loop(level, args.duration, args.poisson)
+        if sampler:
+            sampler.cancel()
+
+        result = {"mode": mode, "level": level, **run.summary(started)}
+        if rss_samples:
+            result["rss_peak_mb"] = max(rss_samples) / 1024 ** 2
+            result["rss_mean_mb"] = float(np.mean(rss_samples)) / 1024 ** 2
+        print_result(result)
+        results.append(result)
+    return results
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    rss = f" rss_peak={result['rss_peak_mb']:.0f}MB" if "rss_peak_mb" in result else ""
+    print(
+        f"{result['mode']}={result['level']:g}: {result['requests']} requests, "
+        f"errors={result['error_rate']:.1%}, {result['throughput_rps']:.2f} req/s, "
+        f"p50={result['latency_p50']:.3f}s p95={result['latency_p95']:.3f}s p99={result['latency_p99']:.3f}s{rss}",
+        flush=True
+    )
+
+
+async def wait_for_health(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Service exited with code {process.returncode}")
+            try:
+                async with session.get(f"{url}/health") as response:
+                    if response.status == 200:
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(1)
+    raise TimeoutError(f"Service did not become healthy within {timeout}s")
+
+
+async def run_sweep(args: argparse.Namespace, clips: List[Dict[str, Any]], weights: List[float]) -> List[Dict[str, Any]]:
+    """Launch the service for every knob combination and measure each"""
+    knobs = []
+    for entry in args.sweep:
+        name, _, values = entry.partition("=")
+        knobs.append([(name, value) for value in values.split(",")])
+
+    url = f"http://127.0.0.1:{args.port}"
+    results = []
+    for combination in itertools.product(*knobs):
+        settings = dict(combination)
+        workers = settings.get("workers", "1")
+        env = {**os.environ, **{name: value for name, value in settings.items() if name != "workers"}}
+        print(f"\n=== {settings} ===", flush=True)
+
+        process = subprocess.Popen(
+            [args.service_python, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(args.port), "--workers", workers],
+            cwd=args.service_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+        )
+        try:
+            await wait_for_health(url, process, args.startup_timeout)
+            levels = await run_levels(args, url, clips, weights, lambda: process_tree_rss(process.pid))
+            results.extend({"settings": settings, **level} for level in levels)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+    return results
+
+
+def positive_levels(cast: Callable[[str], Any]) -> Callable[[str], List[Any]]:
+    """Argparse type for a comma-separated list of positive load levels"""
+    def parse(value: str) -> List[Any]:
+        try:
+            levels = [cast(level) for level in value.split(",")]
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid levels: {value}")
+        if any(level <= 0 for level in levels):
+            raise argparse.ArgumentTypeError(f"levels must be positive: {value}")
+        return levels
+    return parse
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test an ASR service's /transcribe endpoint")
+    parser.add_argument("--url", default="http://localhost:8000", help="Service URL (ignored with --sweep)")
+    parser.add_argument("--concurrency", type=positive_levels(int), help="Comma-separated closed-loop concurrency levels, e.g. 1,4,8")
+    parser.add_argument("--rates", type=positive_levels(float), help="Comma-separated open-loop request rates per second, e.g. 0.5,1,2")
+    parser.add_argument("--poisson", action="store_true", help="Use Poisson arrivals for --rates instead of a fixed interval")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run each load level")
+    parser.add_argument("--clip-mix", default="2:0.5,5:0.3,15:0.2", help="Synthetic clip mix as duration:weight pairs")
+    parser.add_argument("--clips-dir", type=Path, help="Replay real .wav clips from this folder instead")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-request timeout in seconds")
+    parser.add_argument("--warmup-requests", type=int, default=2)
+    parser.add_argument("--server-pid", type=int, help="Sample RSS of this process tree")
+    parser.add_argument("--container", help="Sample RSS of this Docker container")
+    parser.add_argument("--sweep", nargs="+", metavar="KNOB=V1,V2", help="Launch the service per combination; `workers` sets uvicorn workers, anything else is an env var")
+    parser.add_argument("--service-dir", type=Path, help="Service directory containing app.py (required with --sweep)")
+    parser.add_argument(
+        "--service-python",
+        default=sys.executable,
+        help="Python interpreter for services launched by --sweep; needs the service's requirements (torch, transformers, ...)"
+    )
+    parser.add_argument("--port", type=int, default=8099, help="Port for services launched by --sweep")
+    parser.add_argument("--startup-timeout", type=float, default=600, help="Seconds to wait for a launched service's /health")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    if not args.concurrency and not args.rates:
+        parser.error("Specify --concurrency and/or --rates")
+    if args.sweep and not args.service_dir:
+        parser.error("--sweep requires --service-dir")
+
+    clips, weights = load_clips(args.clip_mix, args.clips_dir)
+    if args.sweep:
+        results = asyncio.run(run_sweep(args, clips, weights))
+    else:
+        read_rss = None
+        if args.server_pid:
+            read_rss = lambda: process_tree_rss(args.server_pid)
+        elif args.container:
+            read_rss = lambda: container_rss(args.container)
+        results = asyncio.run(run_levels(args, args.url, clips, weights, read_rss))
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+        logger.info(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()